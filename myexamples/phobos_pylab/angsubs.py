@@ -0,0 +1,52 @@
+import numpy as np
+
+# angle wrapping, unwrapping and differencing on numpy arrays
+# all routines work on scalars or arrays of any shape
+# and take an optional out= array so that long time series can be
+# processed in place or into a preallocated buffer
+
+twopi = 2.0*np.pi
+
+# wrap angles into [0,2pi)
+# np.mod of a tiny negative angle rounds to 2pi itself, that is set to 0
+def wrap_two_pi(x,out=None):
+    y = np.mod(x,twopi,out=out)
+    if isinstance(y,np.ndarray):
+        y[y >= twopi] = 0.0
+    elif (y >= twopi):
+        y = 0.0*y
+    return y
+
+# wrap angles into [-pi,pi)
+def wrap_pi(x,out=None):
+    y = np.add(x,np.pi,out=out)
+    y = wrap_two_pi(y,out=out)
+    return np.subtract(y,np.pi,out=out)
+
+# signed difference a-b of two angles, wrapped into [-pi,pi)
+def diff_ang(a,b,out=None):
+    y = np.subtract(a,b,out=out)
+    return wrap_pi(y,out=out)
+
+# remove 2pi jumps from an angle series along axis
+# jumps larger than pi between neighbouring samples are taken to be wraps
+# same as np.unwrap but can write into out (which may be x itself)
+def unwrap_ang(x,axis=-1,out=None):
+    x = np.asarray(x,dtype=float)
+    if (out is None):
+        out = np.empty(x.shape)
+    n = x.shape[axis]
+    if (n == 0):
+        return out
+    xm = np.moveaxis(x,axis,-1)
+    om = np.moveaxis(out,axis,-1)
+    # number of turns to add, cumulated from the wrapped differences
+    dd = np.diff(xm,axis=-1)
+    corr = wrap_pi(dd)
+    corr[(corr == -np.pi) & (dd > 0.0)] = np.pi
+    corr -= dd
+    corr[np.abs(dd) < np.pi] = 0.0
+    np.cumsum(corr,axis=-1,out=corr)
+    om[...,0] = xm[...,0]
+    np.add(xm[...,1:],corr,out=om[...,1:])
+    return out
@@ -0,0 +1,145 @@
+import numpy as np
+import io
+import os
+import traceback
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import orbsubs_ur
+import ressubs
+
+# analysis of many runs (e.g. a sweep in ks, gamma, omegaz, obliquity, orbit)
+# the runs are spread over a pool of processes, each one is read and
+# reduced to a row of summary numbers
+# an error in one run (missing or corrupt output, ...) is caught and
+# reported in its row, the other runs go on
+# e.g.
+#   rows = batch_summary(["../phobos2/m2","../phobos2/m3"],[1,2])
+#   print_summary(rows)
+
+# columns of the summary table
+summary_names = ('spin_final','obliq_mean','dEdt_median','res_frac','n_capture','p_final',\
+    'a_final','e_final','t_final')
+
+# a spin is taken to be in spin-orbit resonance when spin/n is within
+# ressubs.so_tol of a half integer (n the mean motion of the resolved body)
+# n_capture counts captures into resonance (states lasting at least
+# ressubs.so_minorb orbits), p_final is 2 times spin/n of the
+# state at the end of the run (nan if not in one), see ressubs.py
+# each row also keeps the interval index of the run, see batch_intervals()
+
+# summary numbers of one run, as a dictionary
+def run_summary(fileroot,numberpm,dec=None):
+    run = orbsubs_ur.Run(fileroot,numberpm,dec)
+    tt = run.t
+    aa = run.aa[0]; ee = run.ee[0]
+    spin = run.spin
+    p,dist,inres = ressubs.run_spin_states(run)
+    iv = ressubs.run_intervals(run)
+    # time weighted fraction of the run spent in resonance
+    dt = np.gradient(tt) if (len(tt) > 1) else np.ones(len(tt))
+    row = {}
+    row['spin_final'] = spin[-1]
+    row['obliq_mean'] = np.mean(run.obliquity)
+    row['dEdt_median'] = np.median(run.dEdt)
+    row['res_frac'] = np.sum(dt*inres)/np.sum(dt)
+    row['n_capture'] = len(ressubs.captures(iv,tt[0]))
+    row['p_final'] = p[-1] if inres[-1] else np.nan
+    row['a_final'] = aa[-1]
+    row['e_final'] = ee[-1]
+    row['t_final'] = tt[-1]
+    row['intervals'] = iv
+    return row
+
+# worker for the pool, never raises
+# the printing done while reading is kept out of the way unless verbose
+def run_summary_args(args):
+    fileroot,numberpm,dec,verbose = args
+    pm_pool = orbsubs_ur.pm_pool
+    orbsubs_ur.pm_pool = None  # already one process per run
+    out = io.StringIO()
+    try:
+        if (verbose):
+            row = run_summary(fileroot,numberpm,dec)
+        else:
+            with redirect_stdout(out):
+                row = run_summary(fileroot,numberpm,dec)
+        row['error'] = ''
+    except Exception as err:
+        row = {name:np.nan for name in summary_names}
+        row['error'] = "%s: %s"%(type(err).__name__,err)
+        if (verbose):
+            traceback.print_exc()
+    finally:
+        orbsubs_ur.pm_pool = pm_pool  # as it was, for nworkers=1
+    row['fileroot'] = fileroot
+    row['numberpm'] = numberpm
+    return row
+
+# row for a run whose worker process died
+def dead_row(args,err):
+    row = {name:np.nan for name in summary_names}
+    row.update(fileroot=args[0],numberpm=args[1],error="%s: %s"%(type(err).__name__,err))
+    return row
+
+# summaries of many runs, returned as a list of dictionaries in the order
+# of fileroots, numberpm is one number for all runs or one per run
+# nworkers=1 does the runs one after another in this process
+# a worker that dies (segfault, killed when out of memory) breaks the whole
+# pool, the runs that were not done then are run again each in a process
+# of its own, so only the run that kills its process is lost
+def batch_summary(fileroots,numberpm=1,nworkers=None,dec=None,verbose=False):
+    if np.ndim(numberpm) == 0:
+        numberpm = [numberpm]*len(fileroots)
+    args = [(f,int(n),dec,verbose) for f,n in zip(fileroots,numberpm)]
+    if (nworkers == 1):
+        return [run_summary_args(a) for a in args]
+    rows = [None]*len(args)
+    with ProcessPoolExecutor(max_workers=nworkers) as ex:
+        futures = [ex.submit(run_summary_args,a) for a in args]
+        for j,fut in enumerate(futures):
+            try:
+                rows[j] = fut.result()
+            except BrokenProcessPool:
+                pass  # run again below
+            except Exception as err:
+                rows[j] = dead_row(args[j],err)
+    left = [j for j in range(len(args)) if rows[j] is None]
+    nw = nworkers if (nworkers is not None) else (os.cpu_count() or 1)
+    for k in range(0,len(left),nw):
+        group = left[k:k+nw]
+        pools = [ProcessPoolExecutor(max_workers=1) for j in group]
+        futures = [pool.submit(run_summary_args,args[j]) for pool,j in zip(pools,group)]
+        for pool,j,fut in zip(pools,group,futures):
+            try:
+                rows[j] = fut.result()
+            except Exception as err:  # this run's own worker died
+                rows[j] = dead_row(args[j],err)
+            pool.shutdown()
+    return rows
+
+# print the summary table, or write it to a file if filename is given
+def print_summary(rows,filename=None):
+    lines = ["# fileroot numberpm " + ' '.join(summary_names) + " error"]
+    for row in rows:
+        vals = ' '.join("%.6e"%row[name] for name in summary_names)
+        lines.append("%s %d %s %s"%(row['fileroot'],row['numberpm'],vals,row['error'].replace(' ','_')))
+    if (filename is None):
+        print('\n'.join(lines))
+    else:
+        with open(filename,'w') as fp:
+            fp.write('\n'.join(lines)+'\n')
+
+# spin-orbit state intervals of all the runs as one interval index, the
+# run field is the row number, e.g. captures(batch_intervals(rows))
+def batch_intervals(rows):
+    empty = np.zeros(0,dtype=ressubs.interval_dtype)
+    return ressubs.join_intervals([row.get('intervals',empty) for row in rows])
+
+# the summary table as a dictionary of arrays, name -> (nruns,) array
+def summary_arrays(rows):
+    cols = {name:np.array([row[name] for row in rows]) for name in summary_names}
+    cols['fileroot'] = [row['fileroot'] for row in rows]
+    cols['error'] = [row['error'] for row in rows]
+    return cols
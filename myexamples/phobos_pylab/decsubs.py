@@ -0,0 +1,189 @@
+import numpy as np
+
+# decimation of long time series down to about nout samples
+# each routine returns a sorted array of row indices to keep, so that the
+# same rows can be taken from every column (and from the point mass files)
+# and orbital elements and principal axes are only computed at those rows
+#   'stride'  every kk-th row, kk=int(n/nout), what orbels_arr always did
+#   'minmax'  the rows with min and max of y in each of nout/2 buckets,
+#             keeps the envelope of fast oscillations and short spikes
+#   'lttb'    largest triangle three buckets, one row per bucket chosen to
+#             keep the visual shape of y
+#   'mean'    first row of each of nout buckets, bucket_mean() then gives
+#             the bucket averages of any column for those rows
+#   'all'     every row, no decimation
+
+dec_modes = ('stride','minmax','lttb','mean','all')
+
+# bucket boundaries for splitting n rows into nb nearly equal buckets
+def bucket_edges(n,nb):
+    nb = max(min(nb,n),1)
+    return np.linspace(0,n,nb+1).astype(int)
+
+# every kk-th row
+def dec_stride(n,nout):
+    kk = int(n/nout)
+    if (kk<1):
+        kk=1
+    return np.arange(0,n,kk)
+
+# index of the first min (ufunc np.fmin) or max (np.fmax) of y in each
+# segment y[starts[k]:starts[k+1]], nan values are skipped
+def segment_arg(y,starts,ufunc):
+    ext = ufunc.reduceat(y,starts)
+    cnt = np.diff(np.append(starts,len(y)))
+    hit = np.flatnonzero(y == np.repeat(ext,cnt))
+    seg = np.searchsorted(starts,hit,side='right')-1
+    first = np.concatenate(([True],seg[1:] != seg[:-1])) if len(seg) else seg > 0
+    out = np.array(starts)  # all nan segment, keep its first row
+    out[seg[first]] = hit[first]
+    return out
+
+# index of min and max of y in each bucket
+def dec_minmax(y,nout):
+    y = np.asarray(y,dtype=float)
+    n = len(y)
+    if (n <= nout):
+        return np.arange(n)
+    starts = bucket_edges(n,nout//2)[:-1]
+    return np.unique(np.concatenate((segment_arg(y,starts,np.fmin),segment_arg(y,starts,np.fmax))))
+
+# largest triangle three buckets (Steinarsson 2013)
+# first and last rows are always kept, in each bucket in between the row
+# making the largest triangle with the row kept in the previous bucket and
+# the mean of the next bucket is kept
+# the loop is over buckets (about nout of them), not over rows
+def dec_lttb(x,y,nout):
+    x = np.asarray(x); y = np.asarray(y)
+    n = len(y)
+    if (n <= nout) or (nout < 3):
+        return np.arange(n)
+    edges = 1 + bucket_edges(n-2,nout-2)
+    nb = len(edges)-1
+    # means of each bucket, and of the last row as a final bucket
+    xm = np.add.reduceat(x[1:n-1],edges[:-1]-1)/np.diff(edges)
+    ym = np.add.reduceat(y[1:n-1],edges[:-1]-1)/np.diff(edges)
+    xm = np.append(xm,x[n-1]); ym = np.append(ym,y[n-1])
+    idx = np.zeros(nb+2,dtype=int)
+    idx[-1] = n-1
+    ia = 0
+    for b in range(nb):
+        xb = x[edges[b]:edges[b+1]]; yb = y[edges[b]:edges[b+1]]
+        # twice the triangle area, with vertices a, this row and next mean
+        area = np.abs((x[ia]-xm[b+1])*(yb-y[ia]) - (x[ia]-xb)*(ym[b+1]-y[ia]))
+        ia = edges[b] + np.argmax(area)
+        idx[b+1] = ia
+    return idx
+
+# first row of each bucket, use with bucket_mean()
+def dec_mean(n,nout):
+    return bucket_edges(n,nout)[:-1]
+
+# averages of y over the buckets starting at rows idx (from dec_mean)
+def bucket_mean(y,idx):
+    y = np.asarray(y)
+    cnt = np.diff(np.append(idx,len(y)))
+    return np.add.reduceat(y,idx)/cnt
+
+# rows to keep for a given mode, y is the signal the minmax and lttb modes
+# look at (not needed for stride or mean) and x is time (lttb only)
+def dec_index(mode,n,nout,x=None,y=None):
+    if (mode == 'stride'):
+        return dec_stride(n,nout)
+    if (mode == 'minmax'):
+        return dec_minmax(y,nout)
+    if (mode == 'lttb'):
+        return dec_lttb(x,y,nout)
+    if (mode == 'mean'):
+        return dec_mean(n,nout)
+    if (mode == 'all'):
+        return np.arange(n)
+    raise ValueError("unknown decimation mode %r, should be one of %s"%(mode,dec_modes))
+
+
+# the same decimations done on a series given in chunks, so only one
+# chunk is held in memory at a time
+# chunks is an iterable of (i0,x,y), x and y the time and signal of rows
+# i0 onwards, the chunks in order and covering rows 0 to n-1
+
+# buckets (edges from bucket_edges) that rows i0 to i0+m-1 fall in,
+# returns the first bucket and the starts of the pieces relative to i0
+def chunk_buckets(edges,i0,m):
+    b0 = np.searchsorted(edges,i0,side='right')-1
+    b1 = np.searchsorted(edges,i0+m-1,side='right')-1
+    return b0,np.concatenate(([0],edges[b0+1:b1+1]-i0))
+
+def dec_minmax_chunks(chunks,n,nout):
+    if (n <= nout):
+        return np.arange(n)
+    edges = bucket_edges(n,nout//2)
+    nb = len(edges)-1
+    best = {np.fmin:(np.full(nb,np.inf),np.array(edges[:-1])),
+            np.fmax:(np.full(nb,-np.inf),np.array(edges[:-1]))}
+    for i0,x,y in chunks:
+        y = np.asarray(y,dtype=float)
+        if (len(y) == 0):
+            continue
+        b0,starts = chunk_buckets(edges,i0,len(y))
+        bb = b0 + np.arange(len(starts))
+        for ufunc,(val,idx) in best.items():
+            j = segment_arg(y,starts,ufunc)
+            better = (y[j] < val[bb]) if (ufunc is np.fmin) else (y[j] > val[bb])
+            val[bb[better]] = y[j[better]]
+            idx[bb[better]] = i0 + j[better]
+    return np.unique(np.concatenate([idx for val,idx in best.values()]))
+
+# lttb with two passes over the chunks, chunks() gives a new iterator
+# the first pass finds the bucket means, the second picks the rows
+def dec_lttb_chunks(chunks,n,nout):
+    if (n <= nout) or (nout < 3):
+        return np.arange(n)
+    edges = 1 + bucket_edges(n-2,nout-2)
+    nb = len(edges)-1
+    sx = np.zeros(nb+1); sy = np.zeros(nb+1)
+    for i0,x,y in chunks():
+        rows = i0 + np.arange(len(y))
+        b = np.clip(np.searchsorted(edges,rows,side='right')-1,0,nb)  # row n-1 is bucket nb
+        inside = (rows > 0)
+        sx += np.bincount(b[inside],weights=np.asarray(x)[inside],minlength=nb+1)
+        sy += np.bincount(b[inside],weights=np.asarray(y)[inside],minlength=nb+1)
+    cnt = np.append(np.diff(edges),1)
+    xm = sx/cnt; ym = sy/cnt
+    idx = np.zeros(nb+2,dtype=int)
+    idx[-1] = n-1
+    xa = ya = None  # the row kept in the previous bucket
+    amax = -1.0
+    for i0,x,y in chunks():
+        x = np.asarray(x); y = np.asarray(y)
+        if (i0 == 0):
+            xa = x[0]; ya = y[0]
+        for b in range(max(np.searchsorted(edges,i0,side='right')-1,0),nb):
+            j0 = max(edges[b],i0); j1 = min(edges[b+1],i0+len(y))
+            if (j1 <= j0):
+                break
+            xb = x[j0-i0:j1-i0]; yb = y[j0-i0:j1-i0]
+            area = np.abs((xa-xm[b+1])*(yb-ya) - (xa-xb)*(ym[b+1]-ya))
+            k = np.argmax(area)
+            if (area[k] > amax):
+                amax = area[k]; idx[b+1] = j0+k; xk = xb[k]; yk = yb[k]
+            if (j1 == edges[b+1]):  # bucket done
+                xa = xk; ya = yk; amax = -1.0
+    return idx
+
+# averages of the chunked series y over the buckets starting at rows idx
+def bucket_mean_chunks(chunks,idx,n):
+    cnt = np.diff(np.append(idx,n))
+    sy = np.zeros(len(idx))
+    for i0,x,y in chunks:
+        rows = i0 + np.arange(len(y))
+        b = np.searchsorted(idx,rows,side='right')-1
+        sy += np.bincount(b,weights=y,minlength=len(idx))
+    return sy/cnt
+
+# dec_index for chunks, chunks() gives a new iterator over them
+def dec_index_chunks(mode,n,nout,chunks=None):
+    if (mode == 'minmax'):
+        return dec_minmax_chunks(chunks(),n,nout)
+    if (mode == 'lttb'):
+        return dec_lttb_chunks(chunks,n,nout)
+    return dec_index(mode,n,nout)
@@ -0,0 +1,79 @@
+import numpy as np
+import os
+import json
+import shutil
+
+# append-only on-disk store of derived time series (orbital elements,
+# tilt angles, ...) computed from the text outputs of a run
+# a store is a directory with one raw float64 file per series, name.bin,
+# and meta.json holding the number of rows stored, the fingerprint of the
+# input files the rows were computed from and any state needed to carry
+# on the computation (see derived_series() in orbsubs_ur.py)
+# new rows are appended to the .bin files and meta.json is rewritten last,
+# so a store that was interrupted while being extended still reads as
+# the rows it had before (the extra bytes are cut off on the next append)
+
+def store_meta_name(dirname):
+    return os.path.join(dirname,'meta.json')
+
+def store_bin_name(dirname,name):
+    return os.path.join(dirname,name+'.bin')
+
+# the meta dictionary of a store, None if there is no (readable) store
+def store_meta(dirname):
+    try:
+        with open(store_meta_name(dirname)) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+# the stored series as a dictionary name -> memory mapped (nrows,) array
+def store_load(dirname,meta):
+    n = meta['nrows']
+    cols = {}
+    for name in meta['names']:
+        if (n == 0):
+            cols[name] = np.zeros(0)
+        else:
+            cols[name] = np.memmap(store_bin_name(dirname,name),dtype=float,mode='r',shape=(n,))
+    return cols
+
+# start a new empty store for the series in names, removing any old one
+def store_create(dirname,names,meta):
+    store_clear(dirname)
+    os.makedirs(dirname)
+    meta = dict(meta,nrows=0,names=list(names))
+    for name in names:
+        open(store_bin_name(dirname,name),'wb').close()
+    store_write_meta(dirname,meta)
+    return meta
+
+def store_write_meta(dirname,meta):
+    tmpname = store_meta_name(dirname)+'.tmp'
+    with open(tmpname,'w') as fp:
+        json.dump(meta,fp)
+    os.replace(tmpname,store_meta_name(dirname))
+
+# append a block of rows, cols is a dictionary name -> (n,) array with all
+# the names of the store, newmeta holds the fingerprint and state after
+# the block (nrows and names are filled in here)
+def store_append(dirname,meta,cols,newmeta):
+    n0 = meta['nrows']
+    n = None
+    for name in meta['names']:
+        col = np.ascontiguousarray(cols[name],dtype=float)
+        if (n is None):
+            n = len(col)
+        elif (len(col) != n):
+            raise ValueError("store_append: series %s has %d rows, not %d"%(name,len(col),n))
+        with open(store_bin_name(dirname,name),'r+b') as fp:
+            fp.truncate(n0*8)  # drop anything from an interrupted append
+            fp.seek(n0*8)
+            fp.write(col.tobytes())
+    meta = dict(newmeta,nrows=n0+n,names=meta['names'])
+    store_write_meta(dirname,meta)
+    return meta
+
+def store_clear(dirname):
+    if os.path.isdir(dirname):
+        shutil.rmtree(dirname)
@@ -2,24 +2,18 @@ import numpy as np
 
 
 # solve Kepler's equation, e<1 case
-PREC_ecc_ano=1e-16  # precision
-def ecc_ano(e,l):
-    du=1.0;
-    u0 = l + e*np.sin(l) + 0.5*e*e*np.sin(2.0*l); # first guess
-    #also see M+D equation 2.55
-    # supposed to be good to second order in e, from Brouwer+Clemence              
-    counter=0;
-    while (np.abs(du) > PREC_ecc_ano):
-        l0 = u0 - e*np.sin(u0);  # Kepler's equation here!
-        du = (l - l0)/(1.0 - e*np.cos(u0));
-        u0 += du;  # this gives a better guess 
-        counter = counter + 1
-        if (counter > 10000): 
-            break;  
-        # equation 2.58 from M+D
-        #print(du)
-    
-    return u0;
+PREC_ecc_ano=1e-16  # precision, relative to max(1,|E|)
+NMAX_ecc_ano=10000  # maximum number of Newton iterations
+# an element also stops once its Newton step is below STALL_ecc_ano*max(1,|E|)
+# and no longer getting smaller (it is then bouncing by an ulp or so)
+STALL_ecc_ano=1e-10
+# which e<1 solver to use by default
+#   'newton' iterates to PREC_ecc_ano (at most NMAX_ecc_ano times)
+#   'fast' is non-iterative, bounded cost per element, see ecc_ano_fast()
+# set with kepcart.KEPLER_METHOD = 'fast' or pass method= to the solvers
+KEPLER_METHOD='newton'
+def ecc_ano(e,l,method=None):
+    return ecc_ano_arr(e,l,method)[()]
 # kepler's equation is M = E - e sin E
 # here l is M and we want to solve for E (eccentric anomali)
 
@@ -27,45 +21,176 @@ def ecc_ano(e,l):
 #u0 = ecc_ano(e,l)
 #print(l, u0 - e*np.sin(u0)) for checking accuracy, it works!
 
+# elements idx that keep iterating after a Newton step du (new values u)
+# and their step sizes, duprev holds the previous step of every element
+def newton_left(idx,du,u,duprev):
+    adu = np.abs(du)
+    scale = np.maximum(1.0,np.abs(u))
+    with np.errstate(invalid='ignore'):
+        stalled = (adu < STALL_ecc_ano*scale) & (adu >= duprev[idx])
+        keep = (adu > PREC_ecc_ano*scale) & ~stalled
+    duprev[idx] = adu
+    return idx[keep],duprev
+
+# array version of ecc_ano, e and l are broadcast against each other
+# Newton iterations are only done on the elements that have not yet converged
+# (see PREC_ecc_ano and STALL_ecc_ano)
+# returns an array with the broadcast shape of e,l
+# method is 'newton' or 'fast', default given by KEPLER_METHOD
+def ecc_ano_arr(e,l,method=None):
+    if (method is None):
+        method = KEPLER_METHOD
+    if (method == 'fast'):
+        return ecc_ano_fast(e,l)
+    if (method != 'newton'):
+        raise ValueError("unknown Kepler solver method %r"%(method,))
+    e,l = np.broadcast_arrays(np.asarray(e,dtype=float),np.asarray(l,dtype=float))
+    shape = l.shape
+    e = e.ravel(); l = l.ravel()
+    u0 = l + e*np.sin(l) + 0.5*e*e*np.sin(2.0*l); # first guess
+    #also see M+D equation 2.55
+    # supposed to be good to second order in e, from Brouwer+Clemence
+    idx = np.arange(u0.size)  # indices of elements still iterating
+    duprev = np.full(u0.size,np.inf)
+    counter=0;
+    while (idx.size > 0):
+        ui = u0[idx]; ei = e[idx]
+        l0 = ui - ei*np.sin(ui);  # Kepler's equation here!
+        du = (l[idx] - l0)/(1.0 - ei*np.cos(ui));
+        u0[idx] = ui + du;  # this gives a better guess
+        idx,duprev = newton_left(idx,du,u0[idx],duprev)
+        counter = counter + 1
+        if (counter > NMAX_ecc_ano):
+            break;
+        # equation 2.58 from M+D
+
+    return u0.reshape(shape);
+
+
+# non-iterative e<1 solver with a fixed cost per element
+# starter is the rational/cubic approximation of Markley 1995 (CeMDA 63, 101)
+# followed by one fifth order correction and one final Newton step
+# M is first reduced to [-pi,pi] and the odd symmetry E(-M)=-E(M) is used
+# accuracy is near machine precision for all 0<=e<1, see kepler_accuracy_report()
+def ecc_ano_fast(e,l):
+    e,l = np.broadcast_arrays(np.asarray(e,dtype=float),np.asarray(l,dtype=float))
+    twopi = 2.0*np.pi
+    lr = l - twopi*np.round(l/twopi)  # in [-pi,pi]
+    sgn = np.where(lr < 0.0, -1.0, 1.0)
+    M = np.abs(lr)
+    pi2 = np.pi*np.pi
+    alpha = (3.0*pi2 + 1.6*np.pi*(np.pi - M)/(1.0 + e))/(pi2 - 6.0)
+    d = 3.0*(1.0 - e) + alpha*e
+    q = 2.0*alpha*d*(1.0 - e) - M*M
+    r = 3.0*alpha*d*(d - 1.0 + e)*M + M*M*M
+    w = (np.abs(r) + np.sqrt(q*q*q + r*r))**(2.0/3.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        E = (2.0*r*w/(w*w + w*q + q*q) + M)/d
+    E = np.where(M == 0.0, 0.0, E)  # the starter is 0/0 at M=0 and e=1
+    # fifth order correction, f0..f4 are Kepler's equation and derivatives
+    esinE = e*np.sin(E)
+    ecosE = e*np.cos(E)
+    f0 = E - esinE - M
+    f1 = 1.0 - ecosE
+    f2 = esinE
+    f3 = ecosE
+    f4 = -esinE
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d3 = -f0/(f1 - 0.5*f0*f2/f1)
+        d4 = -f0/(f1 + 0.5*d3*f2 + d3*d3*f3/6.0)
+        d5 = -f0/(f1 + 0.5*d4*f2 + d4*d4*f3/6.0 + d4*d4*d4*f4/24.0)
+        E = E + d5
+        # one Newton step to polish
+        E = E - (E - e*np.sin(E) - M)/(1.0 - e*np.cos(E))
+    E = np.where(M == 0.0, 0.0, E)  # f1=0 there if e=1
+    return sgn*E + (l - lr)
+
+
+# compare the 'fast' solver with the 'newton' one on a grid of e,M
+# prints and returns a dictionary with the worst residuals of Kepler's equation
+# for each solver, the worst difference in E where newton converged,
+# the number of points where newton did not converge and the time each took
+# emax can be set close to 1 to probe the difficult near parabolic case
+def kepler_accuracy_report(ne=100,nm=200,emax=0.999999,tol=1e-12):
+    import time
+    e1 = np.concatenate((np.linspace(0.0,0.9,ne),1.0 - np.logspace(-1,np.log10(1.0-emax),ne)))
+    m1 = np.concatenate((np.linspace(-np.pi,np.pi,nm),np.logspace(-8,0,nm)))
+    e,l = np.meshgrid(e1,m1)
+    t0 = time.time()
+    with np.errstate(all='ignore'):
+        En = ecc_ano_arr(e,l,'newton')
+    t1 = time.time()
+    Ef = ecc_ano_arr(e,l,'fast')
+    t2 = time.time()
+    with np.errstate(all='ignore'):
+        resn = np.abs(En - e*np.sin(En) - l)
+    resf = np.abs(Ef - e*np.sin(Ef) - l)
+    good = (resn < tol)  # where newton converged
+    dE = np.where(good, np.abs(Ef - En), 0.0)
+    jworst = np.unravel_index(np.argmax(resf),resf.shape)
+    report = {'npoints':e.size, 'newton_failures':np.sum(~good),
+       'max_resid_newton':np.max(np.where(good,resn,0.0)), 'max_resid_fast':np.max(resf),
+       'max_dE':np.max(dE), 'e_worst_fast':e[jworst], 'M_worst_fast':l[jworst],
+       'time_newton':t1-t0, 'time_fast':t2-t1}
+    for key in report:
+        print(key, report[key])
+    return report
+
 
 # hyperbolic case
 def ecc_anohyp(e,l):
-    du=1.0;
+    return ecc_anohyp_arr(e,l)[()]
+
+# this things solves M = e sinh(E) - E
+# to test:
+# u0 = ecc_anohyp(e,l)
+# to test:  print(l, e*np.sinh(u0) -u0)
+
+# array version of ecc_anohyp, same conventions as ecc_ano_arr
+def ecc_anohyp_arr(e,l):
+    e,l = np.broadcast_arrays(np.asarray(e,dtype=float),np.asarray(l,dtype=float))
+    shape = l.shape
+    e = e.ravel(); l = l.ravel()
+    # the equation is odd in E, solve for |M| and give E the sign of M
+    sgn = np.where(l < 0.0, -1.0, 1.0)
+    l = np.abs(l)
     u0 = np.log(2.0*l/e + 1.8); # Danby guess
+    idx = np.arange(u0.size)  # indices of elements still iterating
+    duprev = np.full(u0.size,np.inf)
     counter = 0;
-    while(np.abs(du) > PREC_ecc_ano):
-        fh = e*np.sinh(u0) - u0 - l;  # Kepler's equation hyperbolic here
-        dfh = e*np.cosh(u0) - 1.0;
+    while (idx.size > 0):
+        ui = u0[idx]; ei = e[idx]
+        fh = ei*np.sinh(ui) - ui - l[idx];  # Kepler's equation hyperbolic here
+        dfh = ei*np.cosh(ui) - 1.0;
         du = -fh/dfh;
-        u0 = u0 + du;
+        u0[idx] = ui + du;
+        idx,duprev = newton_left(idx,du,u0[idx],duprev)
         counter = counter + 1;
-        if (counter > 10000): 
+        if (counter > NMAX_ecc_ano):
             break;
-    
-    return u0;
 
-# this things solves M = e sinh(E) - E
-# to test:
-# u0 = ecc_anohyp(e,l)
-# to test:  print(l, e*np.sinh(u0) -u0)
+    return (sgn*u0).reshape(shape);
 
 
 # orbital elements to cartesian phase space coordinates
 # parabolic case has not been correctly implemented
+# all arguments can be scalars or arrays (they are broadcast together)
+# elliptic and hyperbolic entries can be mixed
+# scalar input gives scalar output
 def cartesian(GM, a, e, i, longnode, argperi, meananom):
+    GM,a,e,i,longnode,argperi,meananom = np.broadcast_arrays(*[np.asarray(w,dtype=float) \
+        for w in (GM,a,e,i,longnode,argperi,meananom)])
     # solve Kepler's equation, to get eccentric anomali
-    if (e<1):
-        E0 = ecc_ano(e,meananom);  
-    else:
-        E0 = ecc_anohyp(e,meananom);
-        
+    # each solver only sees the entries it is meant for
+    ell = (e<1.0)
+    hyp = ~ell
+    E0 = np.zeros(e.shape)
+    E0[ell] = ecc_ano_arr(e[ell],meananom[ell]);
+    E0[hyp] = ecc_anohyp_arr(e[hyp],meananom[hyp]);
         
-    if (e<1.0):
-        cosE = np.cos(E0);
-        sinE = np.sin(E0);
-    else: 
-        cosE = np.cosh(E0);
-        sinE = np.sinh(E0);
+    cosE = np.zeros(e.shape); sinE = np.zeros(e.shape)
+    cosE[ell] = np.cos(E0[ell]); sinE[ell] = np.sin(E0[ell]);
+    cosE[hyp] = np.cosh(E0[hyp]); sinE[hyp] = np.sinh(E0[hyp]);
         
     a = np.abs(a);
     meanmotion = np.sqrt(GM/(a*a*a));
@@ -73,17 +198,15 @@ def cartesian(GM, a, e, i, longnode, argperi, meananom):
     
     # compute unrotated positions and velocities 
     rovera = (1.0 - e*cosE);
-    if (e>1.0): 
-        rovera = -1.0*rovera;
+    rovera = np.where(e>1.0, -1.0*rovera, rovera);
         
     x = a*(cosE - e);
     y = foo*a*sinE;
-    z = 0.0;
+    z = 0.0*x;
     xd = -a*meanmotion * sinE/rovera;
     yd = foo*a*meanmotion * cosE/rovera;
-    zd = 0.0;
-    if (e>1.0): 
-        x = -1.0*x;
+    zd = 0.0*x;
+    x = np.where(e>1.0, -1.0*x, x);
         
     # rotate by argument of perihelion in orbit plane
     cosw = np.cos(argperi);
@@ -114,11 +237,22 @@ def cartesian(GM, a, e, i, longnode, argperi, meananom):
     state_xd = xd * cosnode - yd * sinnode;
     state_yd = xd * sinnode + yd * cosnode;
     state_zd = zd;
-    return state_x, state_y, state_z, state_xd, state_yd, state_zd
+    return state_x[()], state_y[()], state_z[()], state_xd[()], state_yd[()], state_zd[()]
+
+# same as cartesian but returns an (N,6) array of x,y,z,vx,vy,vz
+# handy for writing initial conditions to a file or passing to an integrator
+def cartesian_arr(GM, a, e, i, longnode, argperi, meananom):
+    state = cartesian(GM, a, e, i, longnode, argperi, meananom)
+    return np.stack([np.ravel(w) for w in state],axis=-1)
 
   
 # cartesian phase space to orbital elements
+# x,y,z,xd,yd,zd can be scalars or arrays (all broadcast together)
+# the special cases are handled element by element with np.where
+# scalar input gives scalar output
 def keplerian(GM,x,y,z,xd,yd,zd):
+    x,y,z,xd,yd,zd = np.broadcast_arrays(*[np.asarray(w,dtype=float) \
+        for w in (x,y,z,xd,yd,zd)])
     # find direction of angular momentum vector 
     rxv_x = y * zd - z * yd;
     rxv_y = z * xd - x * zd;
@@ -131,10 +265,8 @@ def keplerian(GM,x,y,z,xd,yd,zd):
     rdot = rdotv/r;
 
     orbel_i = np.arccos(rxv_z/h);  #inclination!
-    if ((rxv_x !=0.0) or (rxv_y !=0.0)): 
-        orbel_longnode = np.arctan2(rxv_x, -rxv_y);
-    else:
-        orbel_longnode = 0.0;
+    orbel_longnode = np.where((rxv_x !=0.0) | (rxv_y !=0.0), \
+        np.arctan2(rxv_x, -rxv_y), 0.0)
 
     orbel_a = 1.0/(2.0/r - vs/GM); # semi-major axis could be negative
     
@@ -143,44 +275,146 @@ def keplerian(GM,x,y,z,xd,yd,zd):
     # eccentricity
     orbel_e = np.sqrt(ecostrueanom*ecostrueanom + esintrueanom*esintrueanom);
     
-    if ((esintrueanom!=0.0) or (ecostrueanom!=0.0)):
-        trueanom = np.arctan2(esintrueanom, ecostrueanom);
-    else:
-        trueanom = 0.0
+    trueanom = np.where((esintrueanom!=0.0) | (ecostrueanom!=0.0), \
+        np.arctan2(esintrueanom, ecostrueanom), 0.0)
         
     cosnode = np.cos(orbel_longnode);
     sinnode = np.sin(orbel_longnode);
     
     # u is the argument of latitude 
-    if (orbel_i == np.pi/2.0):  # this work around not yet tested
-        u = 0.0
-    else:
-        rcosu = x*cosnode + y*sinnode;
+    # if i is pi/2 then u=0, this work around not yet tested
+    rcosu = x*cosnode + y*sinnode;
+    with np.errstate(divide='ignore', invalid='ignore'):
         rsinu = (y*cosnode - x*sinnode)/np.cos(orbel_i);
-        # this will give an error if i is pi/2 *******!!!!!!!!
-        if ((rsinu!=0.0) or (rcosu!=0.0)): 
-            u = np.arctan2(rsinu, rcosu);
-        else:
-            u = 0.0;
+    u = np.where((rsinu!=0.0) | (rcosu!=0.0), np.arctan2(rsinu, rcosu), 0.0)
+    u = np.where(orbel_i == np.pi/2.0, 0.0, u)
 
     orbel_argperi = u - trueanom;  # argument of pericenter
     
-    # true anomaly to mean anomaly
+    # true anomaly to mean anomaly, both branches are computed and the
+    # right one is chosen for each element
     foo = np.sqrt(np.abs(1.0 - orbel_e)/(1.0 + orbel_e));
-    if (orbel_e <1.0):
-        eccanom = 2.0 * np.arctan(foo*np.tan(trueanom/2.0));
-        orbel_meananom = eccanom - orbel_e * np.sin(eccanom);
-    else:
-        eccanom = 2.0 * np.arctanh(foo*np.tan(trueanom/2.0));
-        orbel_meananom = orbel_e*np.sinh(eccanom) - eccanom;
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eccanom_ell = 2.0 * np.arctan(foo*np.tan(trueanom/2.0));
+        meananom_ell = eccanom_ell - orbel_e * np.sin(eccanom_ell);
+        eccanom_hyp = 2.0 * np.arctanh(foo*np.tan(trueanom/2.0));
+        meananom_hyp = orbel_e*np.sinh(eccanom_hyp) - eccanom_hyp;
+    orbel_meananom = np.where(orbel_e < 1.0, meananom_ell, meananom_hyp)
   
     # adjust argperi to [-pi,pi]
-    if (orbel_argperi > np.pi): 
-        orbel_argperi = orbel_argperi - 2.0*np.pi;
-    if (orbel_argperi < -np.pi): 
-        orbel_argperi = orbel_argperi + 2.0*np.pi;
+    orbel_argperi = np.where(orbel_argperi > np.pi, orbel_argperi - 2.0*np.pi, orbel_argperi)
+    orbel_argperi = np.where(orbel_argperi < -np.pi, orbel_argperi + 2.0*np.pi, orbel_argperi)
 
-    return orbel_a,orbel_e,orbel_i,orbel_longnode,orbel_argperi,orbel_meananom
+    return orbel_a[()],orbel_e[()],orbel_i[()],orbel_longnode[()],\
+           orbel_argperi[()],orbel_meananom[()]
 
 
-    
+# Stumpff functions c2(z) and c3(z), arrays ok
+# series is used near z=0 to avoid cancellation
+def stumpff_c2c3(z):
+    z = np.asarray(z,dtype=float)
+    c2 = np.zeros(z.shape); c3 = np.zeros(z.shape)
+    pos = (z > 1e-4); neg = (z < -1e-4); sml = ~(pos | neg)
+    sz = np.sqrt(z[pos])
+    c2[pos] = (1.0 - np.cos(sz))/z[pos]
+    c3[pos] = (sz - np.sin(sz))/(sz*sz*sz)
+    sz = np.sqrt(-z[neg])
+    c2[neg] = (np.cosh(sz) - 1.0)/(-z[neg])
+    c3[neg] = (np.sinh(sz) - sz)/(sz*sz*sz)
+    zs = z[sml]
+    c2[sml] = 1.0/2.0 - zs/24.0 + zs*zs/720.0 - zs*zs*zs/40320.0
+    c3[sml] = 1.0/6.0 - zs/120.0 + zs*zs/5040.0 - zs*zs*zs/362880.0
+    return c2,c3
+
+
+# two-body (Kepler) drift of cartesian states by time dt, using universal variables
+# works for elliptic, parabolic and hyperbolic orbits
+# GM,x,y,z,xd,yd,zd,dt can be scalars or arrays (all broadcast together)
+# so many states can be advanced by many different dt in one call
+# universal Kepler's equation is solved with Laguerre-Conway iterations,
+# only on the elements that have not yet converged
+# returns x,y,z,xd,yd,zd at time t+dt, scalar input gives scalar output
+PREC_drift=1e-14  # relative precision in universal anomaly
+STALL_drift=1e-10 # stop if |dchi| below this (relative) and no longer decreasing
+NMAX_drift=50     # maximum number of iterations, states not converged are nan
+HMAX_drift=300.0  # max |chi|*sqrt(-alpha) (change in hyperbolic anomaly)
+def kepler_drift(GM,x,y,z,xd,yd,zd,dt):
+    GM,x,y,z,xd,yd,zd,dt = np.broadcast_arrays(*[np.asarray(w,dtype=float) \
+        for w in (GM,x,y,z,xd,yd,zd,dt)])
+    shape = x.shape
+    GM,x,y,z,xd,yd,zd,dt = [w.ravel() for w in (GM,x,y,z,xd,yd,zd,dt)]
+    sGM = np.sqrt(GM)
+    r0 = np.sqrt(x*x + y*y + z*z)
+    vs = xd*xd + yd*yd + zd*zd
+    sig0 = (x*xd + y*yd + z*zd)/sGM  # r.v/sqrt(GM)
+    alpha = 2.0/r0 - vs/GM   # 1/a, negative for hyperbolic orbits
+    # bound orbits are periodic, so only drift by dt modulo a period
+    dtr = dt.copy()
+    bound = (alpha > 0.0)
+    per = 2.0*np.pi/(sGM[bound]*alpha[bound]**1.5)
+    dtr[bound] = dt[bound] - per*np.round(dt[bound]/per)
+    # first guess for universal anomaly chi
+    chi = np.where(bound, sGM*alpha*dtr, sGM*dtr/r0)
+    aux = 1.0 - alpha*r0
+    # hyperbolic: chi grows like log(dt), guess of Vallado (2013, algorithm 8)
+    # where it is smaller than the one above (large |dt|)
+    hyp = (alpha < 0.0) & (dtr != 0.0)
+    am = -1.0/alpha[hyp]; sg = np.sign(dtr[hyp])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        arg = -2.0*GM[hyp]*alpha[hyp]*dtr[hyp]/(sig0[hyp]*sGM[hyp] + sg*np.sqrt(GM[hyp]*am)*aux[hyp])
+        chv = sg*np.sqrt(am)*np.log(arg)
+    use = (arg > 1.0) & np.isfinite(chv) & (np.abs(chv) < np.abs(chi[hyp]))
+    chi[np.flatnonzero(hyp)[use]] = chv[use]
+    # |chi| is kept below chimax on hyperbolic orbits so cosh, sinh in the
+    # Stumpff functions (and squares of them) cannot overflow
+    chimax = np.where(alpha < 0.0, HMAX_drift/np.sqrt(np.abs(alpha)), np.inf)
+    chi = np.clip(chi,-chimax,chimax)
+    nlag = 5.0  # Laguerre order
+    idx = np.arange(chi.size)  # indices of elements still iterating
+    dprev = np.full(chi.size,np.inf)  # previous |dchi|
+    counter = 0
+    while (idx.size > 0):
+        ch = chi[idx]; al = alpha[idx]; s0 = sig0[idx]; au = aux[idx]; rr0 = r0[idx]
+        zz = al*ch*ch
+        c2,c3 = stumpff_c2c3(zz)
+        F = s0*ch*ch*c2 + au*ch*ch*ch*c3 + rr0*ch - sGM[idx]*dtr[idx]
+        dF = s0*ch*(1.0 - zz*c3) + au*ch*ch*c2 + rr0   # this is r
+        ddF = s0*(1.0 - zz*c2) + au*ch*(1.0 - zz*c3)
+        # written with F/dF so huge |dt| cannot overflow
+        Fr = F/dF
+        sq = np.sqrt(np.abs((nlag-1.0)**2 - nlag*(nlag-1.0)*Fr*(ddF/dF)))
+        dchi = -nlag*Fr/(1.0 + sq)
+        chi[idx] = np.clip(ch + dchi,-chimax[idx],chimax[idx])
+        # done when converged, or stalled at roundoff level (see newton_left)
+        adc = np.abs(dchi); sc = np.abs(ch)
+        stalled = (adc < STALL_drift*sc) & (adc >= dprev[idx])
+        dprev[idx] = adc
+        idx = idx[~((adc <= PREC_drift*sc) | stalled)]  # nan keeps going
+        counter = counter + 1
+        if (counter > NMAX_drift):
+            break
+    # states that did not converge are set to nan rather than returned wrong
+    if (idx.size > 0):
+        print("kepler_drift: %d states did not converge, set to nan"%idx.size)
+        chi[idx] = np.nan
+
+    # f and g functions
+    zz = alpha*chi*chi
+    c2,c3 = stumpff_c2c3(zz)
+    r = sig0*chi*(1.0 - zz*c3) + aux*chi*chi*c2 + r0
+    f = 1.0 - chi*chi*c2/r0
+    g = dtr - chi*chi*chi*c3/sGM
+    fd = sGM*chi*(zz*c3 - 1.0)/(r*r0)
+    gd = 1.0 - chi*chi*c2/r
+    xn = f*x + g*xd;  xdn = fd*x + gd*xd
+    yn = f*y + g*yd;  ydn = fd*y + gd*yd
+    zn = f*z + g*zd;  zdn = fd*z + gd*zd
+    return xn.reshape(shape)[()],yn.reshape(shape)[()],zn.reshape(shape)[()],\
+           xdn.reshape(shape)[()],ydn.reshape(shape)[()],zdn.reshape(shape)[()]
+
+# same as kepler_drift but states are given and returned as an (N,6) array
+def kepler_drift_arr(GM,state,dt):
+    state = np.asarray(state,dtype=float)
+    snew = kepler_drift(GM,state[...,0],state[...,1],state[...,2],\
+        state[...,3],state[...,4],state[...,5],dt)
+    return np.stack([np.ravel(w) for w in snew],axis=-1)
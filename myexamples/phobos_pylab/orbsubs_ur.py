@@ -13,6 +13,14 @@ from scipy.signal import medfilt
 
 from kepcart import *
 from outils import * # useful short routines
+from angsubs import * # angle wrapping routines
+import readsubs
+from readsubs import * # reading simulation outputs
+from decsubs import * # decimation of long runs
+from dercache import * # on-disk store of derived quantities
+from pltsubs import * # drawing, with a fast mode for long runs
+from rollsubs import * # rolling statistics
+from ratesubs import * # rates of angles
 
 angfac = 180.0/np.pi # for converting radians to degrees
 twopi = np.pi*2.0
@@ -23,56 +31,115 @@ def residual(ang):
         z = z+ twopi
     return z
 
-def residual_vec(angvec):
-    nvec = len(angvec)
-    mvec = angvec*0.0
-    for i in range(0,nvec):
-        mvec[i] = residual(angvec[i])
-    return mvec
+# same as residual but for arrays
+def residual_vec(angvec,out=None):
+    return wrap_two_pi(angvec,out=out)
 
 
-# read in a pointmass file  format fileroot_pm0.txt
-def readpmfile(fileroot,npi):
+# name of a point mass file
+def pmfilename(fileroot,npi):
     junk = '.txt'
-    filename = "%s_pm%d%s"%(fileroot,npi,junk)
+    return "%s_pm%d%s"%(fileroot,npi,junk)
+
+# read in a pointmass file  format fileroot_pm0.txt
+# only every kk-th line is kept (or the rows in array kk),
+# and at most max_rows lines are read
+def readpmfile(fileroot,npi,kk=1,max_rows=None):
+    filename = pmfilename(fileroot,npi)
     print(filename)
-    tt,x,y,z,vx,vy,vz,mm =\
-           np.loadtxt(filename, skiprows=1, unpack='true') 
+    tt,x,y,z,vx,vy,vz,mm = read_decimated(filename,kk,max_rows=max_rows)  # see readsubs.py
     return tt,x,y,z,vx,vy,vz,mm
 
 # read in an extended mass output  file  format fileroot_ext.txt
-def readresfile(fileroot):
+# only every kk-th line is kept (or the rows in array kk),
+# and at most max_rows lines are read
+# this is the 24 column format ending in Etot,dEdt, files with other
+# columns (e.g. dEdtnow,dEdtave) have to be read by name with readres
+def readresfile(fileroot,kk=1,max_rows=None):
     filename = fileroot+'_ext.txt'
     print(filename)
     t,x,y,z,vx,vy,vz,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,KErot,PEspr,PEgrav,Etot,dEdt =\
-        np.loadtxt(filename, skiprows=1, unpack='true') 
+        read_decimated(filename,kk,max_rows=max_rows)  # see readsubs.py
     return t,x,y,z,vx,vy,vz,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,KErot,PEspr,PEgrav,Etot,dEdt
 
+# read only the named columns of fileroot_ext.txt, using the names in its header
+# e.g. readres(fileroot,['t','omx','omy','omz'])['omz']
+# returns a dictionary name -> array, see readcols() in readsubs.py
+def readres(fileroot,names=None,kk=1,max_rows=None):
+    return readcols(fileroot+'_ext.txt',names,kk,max_rows)
+
+# same but for a point mass file fileroot_pm%d.txt
+def readpm(fileroot,npi,names=None,kk=1,max_rows=None):
+    return readcols(pmfilename(fileroot,npi),names,kk,max_rows)
+
+# number of lines in common to the extended body file and the point mass files
+# (they can differ by a line or so if the run is still going)
+def run_length(fileroot,numberpm):
+    nl = count_rows(fileroot+'_ext.txt')
+    for i in range(numberpm):
+        nl = min(nl,count_rows(pmfilename(fileroot,i)))
+    return nl
+
+
+# rows i0 to nl-1 of the run are in the time window tmin,tmax (None for no limit)
+def run_window(fileroot,numberpm,tmin=None,tmax=None):
+    nl = run_length(fileroot,numberpm)
+    if (tmin is None) and (tmax is None):
+        return nl,0
+    i0,i1 = time_rows(fileroot+'_ext.txt',tmin,tmax)
+    i1 = min(i1,nl)
+    if (i1 <= i0):
+        raise ValueError("%s: no rows with %s <= t <= %s"%(fileroot,tmin,tmax))
+    return i1,i0
 
 # read in all the point mass files at once
 # return a mass array
 # return time array
 # return tuple of position and velocity vectors?
-def readallpmfiles(fileroot,numberpm):
-    mvec = np.zeros(0)    
-    tt,x,y,z,vx,vy,vz,mm=readpmfile(fileroot,0)
-    nt = len(tt)  # length of arrays
-    mvec = np.append(mvec,mm[0])
+# kk and max_rows as for readpmfile
+# the files are read concurrently (see pm_pool) into preallocated arrays
+# if the files have different numbers of lines (run still going) this is
+# reported and only the lines they have in common are used
+# a 'process' pool is started on every call, and its workers get the
+# readsubs settings (use_cache, chunk_bytes, ...) passed to them
+# 'thread' is cheaper to start and np.loadtxt does most of its work
+# outside the GIL
+pm_pool = 'thread'  # 'process', 'thread' or None for one file after another
+def readallpmfiles(fileroot,numberpm,kk=1,max_rows=None,nworkers=None):
+    nrows = [count_rows(pmfilename(fileroot,i)) for i in range(numberpm)]
+    nt_all = min(nrows)
+    if (max(nrows) != nt_all):
+        print("readallpmfiles: point mass files have different lengths:")
+        for i in range(numberpm):
+            print("   %s  %d lines"%(pmfilename(fileroot,i),nrows[i]))
+        print("   only the first %d lines are used"%nt_all)
+    if (max_rows is not None):
+        nt_all = min(nt_all,max_rows)
+    if np.ndim(kk) == 0:
+        nt = len(range(0,nt_all,kk))  # length of arrays
+    else:  # kk is an array of rows to keep
+        kk = kk[kk < nt_all]
+        nt = len(kk)
+    mvec = np.zeros(numberpm)
     xarr = np.zeros((numberpm,nt))
     yarr = np.zeros((numberpm,nt))
     zarr = np.zeros((numberpm,nt))
     vxarr = np.zeros((numberpm,nt))
     vyarr = np.zeros((numberpm,nt))
     vzarr = np.zeros((numberpm,nt))
-    xarr[0] = x
-    yarr[0] = y
-    zarr[0] = z
-    vxarr[0] = vx
-    vyarr[0] = vy
-    vzarr[0] = vz
-    for i in range(1,numberpm):
-        ttt,x,y,z,vx,vy,vz,mm=readpmfile(fileroot,i)
-        mvec = np.append(mvec,mm[0])
+    settings = read_settings() if (pm_pool == 'process') else None
+    args = [(fileroot,i,kk,nt_all,settings) for i in range(numberpm)]
+    if (pm_pool is None) or (numberpm < 2):
+        results = map(readpmfile_args,args)
+    else:
+        from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+        Executor = ProcessPoolExecutor if (pm_pool == 'process') else ThreadPoolExecutor
+        with Executor(max_workers=nworkers) as ex:
+            results = list(ex.map(readpmfile_args,args))
+    for i,(ttt,x,y,z,vx,vy,vz,mm) in enumerate(results):
+        if (i==0):
+            tt = ttt
+        mvec[i] = mm[0]
         xarr[i] = x
         yarr[i] = y
         zarr[i] = z
@@ -82,58 +149,172 @@ def readallpmfiles(fileroot,numberpm):
 
     return tt, mvec, xarr,yarr,zarr,vxarr,vyarr,vzarr
 
+# readpmfile with its arguments in a tuple, for the worker pool
+# settings (from read_settings) are applied first in a worker process
+def readpmfile_args(args):
+    fileroot,i,kk,max_rows,settings = args
+    if (settings is not None):
+        for name in settings:
+            setattr(readsubs,name,settings[name])
+    return readpmfile(fileroot,i,kk,max_rows)
+
+# module settings of readsubs.py, for worker processes
+def read_settings():
+    names = ('chunk_bytes','use_cache','use_rowidx','rowidx_every','parse_pool')
+    return {name:getattr(readsubs,name) for name in names}
+
 # limit the number of points plotted to this
 plmax = 5000   # max number of points for arrays
+# how the runs are cut down to plmax points, see decsubs.py
+# 'stride', 'minmax', 'lttb', 'mean' or 'all' (no decimation)
+dec_mode = 'stride'
+# signal looked at by the minmax and lttb modes, 'spin' or a column of _ext.txt
+dec_key = 'spin'
+
+# rows of a run with nl lines to keep, for decimation mode dec
+# returns a stride kk for 'stride', otherwise an array of row indices
+# minmax and lttb look at the key signal (and time) at full resolution,
+# but it is read in chunks (see key_chunks) so memory use stays bounded
+# with i0 > 0 only rows i0 to nl-1 are looked at (a time window, see
+# time_rows()) and an array of row indices is always returned
+def run_rows(fileroot,nl,dec,key,i0=0):
+    if (dec == 'stride') or (dec == 'all'):
+        kk = int((nl-i0)/plmax) if (dec == 'stride') else 1   # reduce array sizes by this interval!
+        if (kk<1): 
+            kk=1
+        if (i0 > 0):
+            return np.arange(i0,nl,kk)
+        return kk
+    chunks = lambda: key_chunks(fileroot,key,i0,nl)
+    return i0 + dec_index_chunks(dec,nl-i0,plmax,chunks)
+
+# the signal key ('spin' or a column of _ext.txt) of rows r0 to nl-1 of a run
+# in chunks, as (i,t,y) with i counted from r0 (see decsubs.py)
+def key_chunks(fileroot,key,r0,nl):
+    filename = fileroot+'_ext.txt'
+    names = ['t','omx','omy','omz'] if (key == 'spin') else ['t',key]
+    header = read_header(filename)
+    for name in names:
+        if name not in header:
+            raise ValueError("%s: no column %r, columns are %s"%(filename,name,' '.join(header)))
+    jcols = [header.index(name) for name in names]
+    i = 0
+    for chunk in iter_cols(filename,max_rows=nl,usecols=jcols,start_row=r0):
+        y = len_vec(chunk[1],chunk[2],chunk[3]) if (key == 'spin') else chunk[1]
+        yield i,chunk[0],y
+        i += chunk.shape[1]
+
+# orbital elements of many bodies at once
+# body 0 is the central one, mb is an (nb,) array of masses and the
+# positions and velocities are (nb,ns) arrays
+# ref chooses what the elements are w.r.t.
+#   'central'    body 0, GM is m0 + m
+#   'barycenter' center of mass of all the bodies, GM is the total mass
+#   'jacobi'     center of mass of all bodies with lower index, GM is the
+#                sum of the masses up to and including the body
+# returns a,e,i,longnode,argperi,meananom as (nb,ns) arrays, all computed
+# in one keplerian() call, the row of body 0 is nan except for 'barycenter'
+def body_orbels(mb,xb,yb,zb,vxb,vyb,vzb,ref='central'):
+    mb = np.asarray(mb,dtype=float)
+    pos = np.array([xb,yb,zb,vxb,vyb,vzb],dtype=float)  # (6,nb,ns)
+    if (ref == 'central'):
+        d = pos - pos[:,0:1]
+        GM = mb[0] + mb
+    elif (ref == 'barycenter'):
+        d = pos - np.einsum('b,kbn->kn',mb,pos)[:,None,:]/np.sum(mb)
+        GM = np.sum(mb) + 0.0*mb
+    elif (ref == 'jacobi'):
+        mcum = np.cumsum(mb)
+        # center of mass of bodies 0..i-1 for body i
+        com = np.cumsum(mb[None,:,None]*pos,axis=1)/mcum[None,:,None]
+        d = pos.copy()
+        d[:,1:] -= com[:,:-1]
+        GM = mcum
+    else:
+        raise ValueError("unknown reference %r, should be central, barycenter or jacobi"%(ref,))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        els = keplerian(GM[:,None],*d)
+    els = [np.array(el) for el in els]
+    if (ref != 'barycenter'):
+        for el in els:
+            el[0] = np.nan  # central body has no orbit about itself
+    return tuple(els)
+
+# what the orbital elements from orbels_arr are with respect to, see body_orbels
+pm_ref = 'central'
+
+# elements of the resolved body (x,y,z,vx,vy,vz, mass 1) and the point masses,
+# as arrays (numberpm,ns), the resolved body in index imc
+# for jacobi coordinates the order is central, resolved, then the point masses
+def run_orbels(mvec,xarr,yarr,zarr,vxarr,vyarr,vzarr,x,y,z,vx,vy,vz,imc=0,ref=None):
+    if (ref is None):
+        ref = pm_ref
+    numberpm = len(mvec)
+    others = [i for i in range(numberpm) if i != imc]
+    order = [imc] + others
+    mb = np.concatenate(([mvec[imc],1.0],mvec[others]))
+    stack = lambda a,b: np.vstack((a[imc],b,a[others]))
+    els = body_orbels(mb,stack(xarr,x),stack(yarr,y),stack(zarr,z),\
+        stack(vxarr,vx),stack(vyarr,vy),stack(vzarr,vz),ref)
+    out = []
+    for el in els:
+        ela = np.zeros((numberpm,el.shape[1]))
+        ela[imc] = el[1]          # resolved body
+        ela[others] = el[2:]      # point masses
+        out.append(ela)
+    return tuple(out)
 
 # fill arrays with orbital elements all w.r.t to first point mass
 # which is assumed to be the central object
 # resolved body orbit is put in first index of arrays
 # computes obliquity,spin,J also 
-def orbels_arr(fileroot,numberpm):
+# files are read in chunks and only the rows kept by the decimation are stored,
+# so memory use is set by plmax and readsubs.chunk_bytes, not by file length
+# dec is the decimation mode (default dec_mode), it is done before
+# anything else so elements and principal axes are only computed at kept rows
+# for dec='mean' only the returned dEdt is averaged over each bucket, the
+# other outputs (elements, angles, spin, ...) are taken at the first row of
+# each bucket, averaging angles and elements over a bucket would not mean much
+# tmin,tmax limit the run to a time window, only the rows in the window are
+# read (found with the time index, see time_rows() in readsubs.py)
+# kk (a stride or rows, from run_rows) can be given if it is already known
+def orbels_arr(fileroot,numberpm,dec=None,tmin=None,tmax=None,kk=None):
+    if (dec is None):
+        dec = dec_mode
+    nl,i0 = run_window(fileroot,numberpm,tmin,tmax)
+    if (kk is None):
+        kk = run_rows(fileroot,nl,dec,dec_key,i0)  # stride or rows to keep
     t,x,y,z,vx,vy,vz,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,KErot,PEspr,PEgrav,Etot,dEdt=\
-       readresfile(fileroot)  # resolved body stuff
+       readresfile(fileroot,kk,nl)  # resolved body stuff
     tt, mvec, xarr,yarr,zarr,vxarr,vyarr,vzarr=\
-       readallpmfiles(fileroot,numberpm)  # point mass stuff
+       readallpmfiles(fileroot,numberpm,kk,nl)  # point mass stuff
     imc = 0  # index of central mass
     GM = mvec[imc]   #+1 possibly?
     # print('GM',GM);
-    nl = len(tt)
-    kk = np.int(nl/plmax)    # reduce array sizes by this interval!
-    if (kk<1): 
-        kk=1
-    ts = t[0::kk]  # short time array
-    print("kk=",kk);
+    ts = t  # short time array
+    if (np.ndim(kk) == 0):
+        print("kk=",kk);
+    else:
+        print(dec,"decimation,",len(ts),"rows kept");
     # coordinates with respect to first point mass that is assumed to be central object
     dxarr = x- xarr[imc];  dyarr= y- yarr[imc];  dzarr= z- zarr[imc]
     dvxarr=vx-vxarr[imc]; dvyarr=vy-vyarr[imc]; dvzarr=vz-vzarr[imc]
-    # reduce array size
-    dxarr = dxarr[0::kk];    dyarr =  dyarr[0::kk];  dzarr =  dzarr[0::kk]
-    dvxarr = dvxarr[0::kk]; dvyarr = dvyarr[0::kk]; dvzarr = dvzarr[0::kk]
     ns = len(dxarr)
     #print(ns)
-    xarrs = np.zeros((numberpm,ns))
-    #print(len(xarrs[0]))
-    aaarr = xarrs*0.0; eearr = xarrs*0.0; iiarr = xarrs*0.0;
-    lnarr = xarrs*0.0; ararr = xarrs*0.0; maarr = xarrs*0.0;
     #
-    # compute orbital elements for the resolved body assuming w.r.t to central mass set by imc
-    for k in range(ns):      # for the resolved body
-        aa,ee,ii,longnode,argperi,meananom=\
-               keplerian(GM+1,dxarr[k],dyarr[k],dzarr[k],dvxarr[k],dvyarr[k],dvzarr[k])
-        aaarr[imc][k] = aa
-        eearr[imc][k] = ee
-        iiarr[imc][k] = ii
-        lnarr[imc][k] = longnode
-        ararr[imc][k] = argperi 
-        maarr[imc][k] = meananom 
+    # compute orbital elements for the resolved body (mass 1) and the point masses
+    # all at once, w.r.t to central mass set by imc (or see pm_ref)
+    # resolved body goes in index imc of the arrays
+    aaarr,eearr,iiarr,lnarr,ararr,maarr=\
+           run_orbels(mvec,xarr,yarr,zarr,vxarr,vyarr,vzarr,x,y,z,vx,vy,vz,imc)
     # mms =np.sqrt(GM*aaarr[imc,0]**-3) # mean motion of resolved to check!
     # print('mean motion', mms) 
 
-    omxs = omx[0::kk]; llxs = llx[0::kk];  # spins and spin angular momentums
-    omys = omy[0::kk]; llys = lly[0::kk];
-    omzs = omz[0::kk]; llzs = llz[0::kk];
-    Ixxs = Ixx[0::kk]; Iyys = Iyy[0::kk]; Izzs = Izz[0::kk]; # moments of inertia
-    Ixys = Ixy[0::kk]; Iyzs = Iyz[0::kk]; Ixzs = Ixz[0::kk];
+    omxs = omx; llxs = llx;  # spins and spin angular momentums
+    omys = omy; llys = lly;
+    omzs = omz; llzs = llz;
+    Ixxs = Ixx; Iyys = Iyy; Izzs = Izz; # moments of inertia
+    Ixys = Ixy; Iyzs = Iyz; Ixzs = Ixz;
     no_x,no_y,no_z=crossprod_unit(dxarr,dyarr,dzarr,dvxarr,dvyarr,dvzarr)  #orbit normal
     nlx,nly,nlz = normalize_vec(llxs,llys,llzs) # body spin angular momentum unit vector
 
@@ -142,60 +323,38 @@ def orbels_arr(fileroot,numberpm):
     ang_so = np.arccos(ang_so)*angfac   # obliquity  in degrees
     obliquity_deg = ang_so
     spin = len_vec(omxs,omys,omzs)
+    # principal axes for all times in one pass, everything below uses these
+    axes = principal_axes(Ixxs,Iyys,Izzs,Ixys,Iyzs,Ixzs)
+    I3s,I2s,I1s,vmax,vmin,vmed = axes
     # compute a bunch of angles for body w.r.t to spin and angular momentum vectors
     tvec_b,svec_ma,lvec_ma,svec_mi,lvec_mi,svec_me,lvec_me,ang_ll,gdot,ldot,\
             lam1dot, spinvec=\
-            vec_tilts(1,ts,omxs,omys,omzs,llxs,llys,llzs,Ixxs,Iyys,Izzs,Ixys,Iyzs,Ixzs)
+            vec_tilts(1,ts,omxs,omys,omzs,llxs,llys,llzs,Ixxs,Iyys,Izzs,Ixys,Iyzs,Ixzs,axes)
     Jvec = lvec_ma  # angle between angular momentum and principal body axis
     # Jvec is an NPA angle!
     prec_ang=precess_ang(llxs,llys,llzs,1.0,0.0,0.0,0.0,1.0,0.0)
     # precession angle w.r.t to xyz coordinate system, given are x and y vectors assuming
     # that they are similar to the orbital plane
 
-    # for point masses compute orbital elements, w.r.t to imc as central one
-    for i in range(1,numberpm):
-        dxarr = xarr[i]- xarr[imc];  dyarr= yarr[i] -  yarr[imc];  dzarr= zarr[i]- zarr[imc]
-        dvxarr=vxarr[i]-vxarr[imc]; dvyarr=vyarr[i] - vyarr[imc]; dvzarr=vzarr[i]-vzarr[imc]
-        dxarr   = dxarr[0::kk];  dyarr =  dyarr[0::kk];  dzarr =  dzarr[0::kk]
-        dvxarr = dvxarr[0::kk]; dvyarr = dvyarr[0::kk]; dvzarr = dvzarr[0::kk]
-        for k in range(ns):    # for the point masses  
-            dx  =  xarr[i][k] -  xarr[imc][k]
-            dy  =  yarr[i][k] -  yarr[imc][k]
-            dz  =  zarr[i][k] -  zarr[imc][k]
-            dvx = vxarr[i][k] - vxarr[imc][k]
-            dvy = vyarr[i][k] - vyarr[imc][k]
-            dvz = vzarr[i][k] - vzarr[imc][k]
-            aa,ee,ii,longnode,argperi,meananom=\
-               keplerian(GM +mvec[i],dxarr[k],dyarr[k],dzarr[k],dvxarr[k],dvyarr[k],dvzarr[k])
-            aaarr[i][k] = aa
-            eearr[i][k] = ee
-            iiarr[i][k] = ii
-            lnarr[i][k] = longnode
-            ararr[i][k] = argperi 
-            maarr[i][k] = meananom 
-
     # compute body orientation angle of principal axis in xyplane
     # and body tilt w.r.t to z axis
-    phi_Eu = spin*0.0
-    theta_Eu = spin*0.0
-    bphi_Eu = spin*0.0
-    for k in range(ns):  # vmin corresponds to long axis of body, vmax to shortest axis
-       vmax,vmin,vmed = evec(k,Ixxs,Iyys,Izzs,Ixys,Iyzs,Ixzs)  # eigenvectors are body orientation axes
-       phi_Eu[k] = np.arctan2(vmin[1],vmin[0]);  # an Euler angle, w.r.t to xyz coord system
-       # angle of body major axis on xy plane
-       # xy, orientation of body major axis gives this angle
-       theta_Eu[k] = np.arccos(vmax[2]);  # another Euler angle
-       # angle of body minor axis w.r.t to z axis
-       bphi_Eu[k] = np.arctan2(vmax[1],vmax[0]);  # another angle
-       # angle of body minor axis on xy plane 
-
-    I3,I2,I1= I3I2I1(0,Ixxs,Iyys,Izzs,Ixys,Iyzs,Ixzs)
+    # vmin corresponds to long axis of body, vmax to shortest axis
+    # eigenvectors are body orientation axes
+    phi_Eu = np.arctan2(vmin[:,1],vmin[:,0]);  # an Euler angle, w.r.t to xyz coord system
+    # angle of body major axis on xy plane
+    # xy, orientation of body major axis gives this angle
+    theta_Eu = np.arccos(vmax[:,2]);  # another Euler angle
+    # angle of body minor axis w.r.t to z axis
+    bphi_Eu = np.arctan2(vmax[:,1],vmax[:,0]);  # another angle
+    # angle of body minor axis on xy plane 
+
+    I3,I2,I1= I3s[0],I2s[0],I1s[0]
     print("I3I2I1 ",I3,I2,I1);
     gam = (I2-I1)/I3  # (B-A)/C
     alpha = np.sqrt(3.0*(I2-I1)/I3)  # sqrt(3*(B-A)/C) = sqrt(3gamma)asphericity parm for libr
     qeff = (I3 - (I1 + I2)/2)/I3   # [C - (A+B)/2]/C for wobble
     print("alpha(lib)=",alpha, " qeff(wobble)=",qeff, " gam =",gam);
-    I3,I2,I1= I3I2I1(len(Ixxs)-1,Ixxs,Iyys,Izzs,Ixys,Iyzs,Ixzs)
+    I3,I2,I1= I3s[-1],I2s[-1],I1s[-1]
     print("I3I2I1 ",I3,I2,I1);
     gam = (I2-I1)/I3  # (B-A)/C
     alpha = np.sqrt(3.0*(I2-I1)/I3)  # sqrt(3*(B-A)/C) = sqrt(3gamma)asphericity parm for libr
@@ -203,8 +362,10 @@ def orbels_arr(fileroot,numberpm):
     print("alpha(lib)=",alpha, " qeff(wobble)=",qeff, " gam =",gam);
    
    
-    Etots = Etot[0::kk]
-    dEdts = dEdt[0::kk]
+    Etots = Etot
+    dEdts = dEdt
+    if (dec == 'mean'):  # average dEdt over buckets rather than sample it
+        dEdts = bucket_mean_chunks(key_chunks(fileroot,'dEdt',i0,nl),kk-i0,nl-i0)
     Ivec =(I3,I2,I1)
 
     return ts,mvec,aaarr,eearr,iiarr,lnarr,ararr,maarr,obliquity_deg,spin,Jvec,prec_ang,\
@@ -212,40 +373,50 @@ def orbels_arr(fileroot,numberpm):
 
 
 # not used in this file
-# computes obliquity,spin,J 
-def give_body_angs(fileroot):
-    # angle between body angular momentum and orbit normal
-    t,x,y,z,vx,vy,vz,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,KErot,PEspr,PEgrav,Etot,dEdt=\
-       readresfile(fileroot)  # resolved body stuff
-    numberpm=1
-    tt, mvec, xarr,yarr,zarr,vxarr,vyarr,vzarr=\
-       readallpmfiles(fileroot,numberpm)  # point mass read in stuff
-    # normal to orbit
-    imc = 0  # central mass, assume that this is the 
-    dx = x - xarr[imc]; dvx = vx - vxarr[imc]
-    dy = y - yarr[imc]; dvy = vy - vyarr[imc]
-    dz = z - zarr[imc]; dvz = vz - vzarr[imc]
-    no_x,no_y,no_z=crossprod_unit(dx,dy,dz,dvx,dvy,dvz)  #orbit normal
-    nlx,nly,nlz = normalize_vec(llx,lly,llz)  # body spin angular momentum unit vect
-    ang_so = dotprod(nlx,nly,nlz,no_x,no_y,no_z)
-    ang_so = np.arccos(ang_so)*angfac   # obliquity  in degrees
-    obliquity_deg = ang_so
-    spin = len_vec(omx,omy,omz)
-    # see tilts() on what this computes
-    kb=1  # every 
-    tvec_b,svec_ma,lvec_ma,svec_mi,lvec_mi,svec_me,lvec_me,ang_ll,gdot,ldot,\
-            lam1dot, spinvec=\
-            vec_tilts(kb,t,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz)
-    Jvec = lvec_ma  # angle between angular momentum and principal body axis
-    return obliquity_deg,spin,Jvec
+# computes obliquity,spin,J at every row (or takes them from run, a Run
+# of fileroot, see Run.body_angs)
+def give_body_angs(fileroot,run=None):
+    if (run is None):
+        run = Run(fileroot,1,'all')
+    return run.body_angs()
 
 
 ## jj is resonance index for jj+dj:jj resonance
-def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
+# running median of dEdt of a Run at its (decimated) times, over windows
+# of smo_w of those samples
+# with smo_full it is computed from every row of the file (windows of
+# smo_w times the decimation stride) so the trend is not aliased,
+# otherwise from the decimated dEdt
+# windows of the first and last rows take in the rows of the file on either
+# side of them, ends of the file are medians of the part of the window inside
+smo_w = 101
+smo_full = True
+def smooth_dEdt(run):
+    if not smo_full:
+        return rolling_stat(run.dEdt,smo_w,'median')
+    rows = run.rows
+    w = smo_w*max(int((rows[-1]+1-rows[0])/len(rows)),1)
+    start = max(rows[0]-w//2,0)  # the windows of the first rows wanted
+    end = min(rows[-1]+1+w//2,run_length(run.fileroot,run.numberpm))  # and of the last
+    return rolling_column(run.fileroot+'_ext.txt','dEdt',w,'median',kk=rows,max_rows=end,\
+        start_row=start)
+
+## run is an optional Run for fileroot, so the files are not read again
+## fast=True draws with the fast routines of pltsubs.py on an Agg canvas
+## (default plt_fast), figure time then does not grow with the run length
+## saveit can be a png filename, or nonzero for fileroot.png
+## with fast=True the figure is returned (it is not known to pyplot), otherwise
+## nothing is, so a notebook cell ending in plt_cols(...) shows it only once
+plt_fast = False
+def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj,run=None,fast=None):
+    if (fast is None):
+        fast = plt_fast
+    if (run is None):
+        run = Run(fileroot,numberpm,None,tmin if (tmin > 0) else None,tmax if (tmax > 0) else None)
     tt,mvec,aaarr,eearr,iiarr,lnarr,ararr,maarr,obliq_deg,spin,Jvec,prec_ang,phi_Eu,theta_Eu,bphi_Eu,dEdt,Ivec=\
-       orbels_arr(fileroot,numberpm)
-    varpi = lnarr + ararr
-    meanlongitude = varpi + maarr
+       run.orbels
+    varpi = run.varpi
+    meanlongitude = run.meanlongitude
     # get orbels of second point mass in terms of com of resolved and first body
     #ts,aaarr_p,eearr_p,iiarr_p,lnarr_p,ararr_p,maarr_p = orbel_com(fileroot,numberpm,1)
     #varpi_p = lnarr_p + ararr_p; meanlongitude_p = varpi_p + maarr_p
@@ -255,9 +426,9 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
     ###########set up figure
     #plt.rcParams.update({'font.size': 14})
     nvpanels=6
-    f,axarr =  plt.subplots(nvpanels,2, dpi=100, figsize=(11,8), sharex=True)
-    plt.autoscale(enable=True, axis='x', tight=True)
-    plt.subplots_adjust(left=0.09, right=0.99, top=0.99, bottom=0.10, \
+    f,axarr =  fig_panels(nvpanels,2,fast, dpi=100, figsize=(11,8), sharex=True)
+    axarr[-1,-1].autoscale(enable=True, axis='x', tight=True)
+    f.subplots_adjust(left=0.09, right=0.99, top=0.99, bottom=0.10, \
         wspace=0.22, hspace=0.0)
     xmin = 0.0; xmax = np.max(tt)
     iimin = 0
@@ -265,7 +436,7 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
         xmax = np.min([xmax,tmax])
     if (tmin > 0):
         xmin = tmin;  
-        iimin = np.argmin(abs(tmin-tt))
+        iimin = min(np.searchsorted(tt,tmin),len(tt)-1)
     mm0 = (mvec[0]+1)**0.5*aaarr[0]**-1.5  # mean motion 
 
     colorstr = ['k', 'r', 'b', 'g', 'm', 'c']
@@ -273,7 +444,7 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
 
     il = 0; ih=0  # top left
     axarr[il,ih].set_ylabel('obliquity (deg)')
-    axarr[il,ih].plot(tt,obliq_deg,'c.', ms=2) # label='')
+    pdots(axarr[il,ih],tt,obliq_deg,'c',2,fast) # label='')
     axarr[il,ih].set_xlim([xmin,xmax])
 
     il = 1; ih=0  # second left
@@ -283,9 +454,8 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
         ytop = aaarr[ip]*eearr[ip]                                       ## ee err
         ybot = ytop             
         if (max(aaarr[ip])<300):
-           axarr[il,ih].scatter(tt,aaarr[ip],color=colorl, s=1) # label='') # aa
-           axarr[il,ih].errorbar(tt,aaarr[ip],yerr=[ybot,ytop],\
-               linestyle="None", marker="None", color=colorl)
+           pscatter(axarr[il,ih],tt,aaarr[ip],colorl,1,fast) # label='') # aa
+           perrorbar(axarr[il,ih],tt,aaarr[ip],ybot,ytop,colorl,fast)
 
     #axarr[il,ih].set_ylim(0,50);
 
@@ -303,30 +473,28 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
         #axarr[il,ih].plot(tt,resang,'.', color='purple',ms=2) # label='')
         #axarr[il,ih].set_ylim([0.0,2.0*np.pi])
 
-    esmo = medfilt(dEdt,101)
-    i0=0; i1=0
-    if (len(dEdt)>  500):
-        i0=200
-        i1=len(dEdt) - 101
-    axarr[il,ih].plot(tt[i0:i1],np.log10(esmo[i0:i1]+1e-10),',', color='gray',ms=1);
+    # running median of dEdt over smo_w plotted points, see smooth_dEdt()
+    esmo = smooth_dEdt(run)
+    i0=0; i1=len(dEdt)
+    pdots(axarr[il,ih],tt[i0:i1],np.log10(esmo[i0:i1]+1e-10),'gray',1,fast,',');
     axarr[il,ih].set_ylabel('log10 dEdt')
     ax_r = axarr[il,ih].twinx()
     try1 = np.log10(esmo+1e-10) +  7.5*np.log10(abs(aaarr[0]))
-    ax_r.plot(tt[i0:i1],try1[i0:i1],',', color='violet',ms=1);
+    pdots(ax_r,tt[i0:i1],try1[i0:i1],'violet',1,fast,',');
 
     il = 3; ih=0  # fourth left 
     #axarr[il,ih].set_ylabel('Oms-varpi_p')
     #domega = residual_vec(prec_ang-ararr[1])
     axarr[il,ih].set_ylabel('Jvec deg')
     Jvec_deg = Jvec%np.pi *180./np.pi;
-    axarr[il,ih].plot(tt,Jvec_deg,'.', color='cornflowerblue',ms=2) # label='')
+    pdots(axarr[il,ih],tt,Jvec_deg,'cornflowerblue',2,fast) # label='')
     axarr[il,ih].set_ylim([0.0,max(Jvec_deg)])
 
     il = 4; ih=0  # fifth left 
     axarr[il,ih].set_ylabel('inclinations (deg)')
     for ip in range(numberpm):
         colorl = colorstr[ip%ncolors]
-        axarr[il,ih].scatter(tt,iiarr[ip]*180.0/np.pi,color=colorl, s=1) # label='')
+        pscatter(axarr[il,ih],tt,iiarr[ip]*180.0/np.pi,colorl,1,fast) # label='')
 
     il = 5; ih=0  # sixth left 
     if (numberpm >1):
@@ -341,9 +509,9 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
       #some_ang3  = residual_vec(4*prec_ang- 1*lnarr[0]);
       #axarr[il,ih].plot(tt,some_ang3,'.', color='lightgreen',ms=1);
       some_ang3  = residual_vec(phi_Eu - 1*meanlongitude[0] + 1*meanlongitude[1]);
-      axarr[il,ih].plot(tt,some_ang3,'.', color='darkgreen',ms=1);
+      pdots(axarr[il,ih],tt,some_ang3,'darkgreen',1,fast);
       some_ang4  = residual_vec(phi_Eu - 2*meanlongitude[0] + 1*meanlongitude[1]);
-      axarr[il,ih].plot(tt,some_ang4,'.', color='lightgreen',ms=1);
+      pdots(axarr[il,ih],tt,some_ang4,'lightgreen',1,fast);
 
     il = 0; ih=1  # top right
     axarr[il,ih].set_ylabel('spin')
@@ -353,16 +521,15 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
     ares = aaarr[0]
     nres = sGM/abs(ares)**1.5
     nres_min = np.min(nres)
-    kmax = np.int(2*spinmax/nres_min)
-    for i in range(0,kmax+2):
-       axarr[il,ih].plot(tt,nres*i/2,'.', color="pink",ms=2)
-    axarr[il,ih].plot(tt,spin,'.', color='green',ms=2) # label='')
+    kmax = int(2*spinmax/nres_min)
+    pguides(axarr[il,ih],tt,nres,np.arange(0,kmax+2)/2,"pink",2,fast)
+    pdots(axarr[il,ih],tt,spin,'green',2,fast) # label='')
 
     il = 1; ih=1  # second right
     axarr[il,ih].set_ylabel('Oms-Om')
     domega = residual_vec(prec_ang-lnarr[0])
-    axarr[il,ih].plot(tt,residual_vec(lnarr[0]),'.', color='grey',ms=1) # label='')
-    axarr[il,ih].plot(tt,residual_vec(prec_ang),'.', color='pink',ms=1)
+    pdots(axarr[il,ih],tt,residual_vec(lnarr[0]),'grey',1,fast) # label='')
+    pdots(axarr[il,ih],tt,residual_vec(prec_ang),'pink',1,fast)
     #axarr[il,ih].plot(tt,residual_vec(meanlongitude[1]),'.', color='orange',ms=1)
     #axarr[il,ih].plot(tt,residual_vec(varpi[0]),'.', color='orange',ms=1)
     #angtry = residual_vec(prec_ang+varpi[0])
@@ -372,8 +539,8 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
     #axarr[il,ih].plot(tt,angtry,'.', color='cyan',ms=1) # label='')
     #axarr[il,ih].plot(tt,angtry2,'.', color='orange',ms=1) # label='')
     some_ang2 = residual_vec(bphi_Eu - lnarr[0]);
-    axarr[il,ih].plot(tt,some_ang2,'.', color='red',ms=1);
-    axarr[il,ih].plot(tt,domega,'.', color='blue',ms=2) # label='')
+    pdots(axarr[il,ih],tt,some_ang2,'red',1,fast);
+    pdots(axarr[il,ih],tt,domega,'blue',2,fast) # label='')
     axarr[il,ih].set_ylim([0.0,2.0*np.pi])
 
 
@@ -383,8 +550,8 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
     #axarr[il,ih].set_ylabel('Oms-varpi')
     phi_Eu_res = residual_vec(phi_Eu - meanlongitude[0]) 
     theta_Eu_res = residual_vec(theta_Eu)%np.pi;
-    axarr[il,ih].plot(tt,theta_Eu_res,'.', color='darkgreen',ms=2) # label='')
-    axarr[il,ih].plot(tt,phi_Eu_res,'.', color='darkred',ms=2) # label='')
+    pdots(axarr[il,ih],tt,theta_Eu_res,'darkgreen',2,fast) # label='')
+    pdots(axarr[il,ih],tt,phi_Eu_res,'darkred',2,fast) # label='')
     axarr[il,ih].set_ylabel(r'$\phi_{Eu} - \lambda, \theta_{Eu}$')
     axarr[il,ih].set_ylim([ 0.0*np.pi,1.0*np.pi])
 
@@ -405,15 +572,15 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
         pmean = np.mean(pratio)
         if (pmean < 1):
             pratio = 1.0/pratio
-        axarr[il,ih].scatter(tt,pratio,color=colorl, s=1) # label='')
-        ax_r.scatter(tt,r_rat,color='orange', s=1) # label='')
+        pscatter(axarr[il,ih],tt,pratio,colorl,1,fast) # label='')
+        pscatter(ax_r,tt,r_rat,'orange',1,fast) # label='')
 
 
     il = 4; ih=1  # fifth   right
     axarr[il,ih].set_ylabel('eccentricities')
     for ip in range(numberpm):
         colorl = colorstr[ip%ncolors]
-        axarr[il,ih].scatter(tt,eearr[ip],color=colorl, s=1) # label='')
+        pscatter(axarr[il,ih],tt,eearr[ip],colorl,1,fast) # label='')
 
     il = 5; ih=1  # sixth  right
     if (numberpm >1):
@@ -422,11 +589,11 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
     Rplus =1.5
     J2=0.03
     prf = 1.5*J2*(Rplus/aaarr[0])**2 # ratio of precession freq
-    axarr[il,ih].plot(tt,mm0,'.',color='gray',ms=1);
-    axarr[il,ih].plot(tt,prf,'.',color='gray',ms=1);
+    pdots(axarr[il,ih],tt,mm0,'gray',1,fast);
+    pdots(axarr[il,ih],tt,prf,'gray',1,fast);
     # axarr[il,ih].plot(tt,prf/2,'.',color='red',ms=1);
     if (numberpm >1):
-       axarr[il,ih].plot(tt,mratio,'.',color='blue',ms=1);
+       pdots(axarr[il,ih],tt,mratio,'blue',1,fast);
     #axarr[il,ih].plot(tt,mm1,'.',color='darkblue',ms=1);
     I3 = Ivec[0]; I2 = Ivec[1]; I1 = Ivec[2]
     gam = (I2-I1)/I3
@@ -434,12 +601,18 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax,jj,dj):
     qeff = (I3 - (I1 + I2)/2)/I3   # [C - (A+B)/2]/C for wobble
     #print("alpha(lib)=",alpha, " qeff(wobble)=",qeff, " gam =",gam);
     #axarr[il,ih].plot(tt,alpha + tt*0,'.',color='green',ms=1);
-    axarr[il,ih].plot(tt,qeff + tt*0,'.',color='orange',ms=1);
+    pguides(axarr[il,ih],tt,qeff + tt*0,[1.0],'orange',1,fast);
 
 
-    plt.ticklabel_format(axis='x', style='sci', scilimits=(-2,2))
+    axarr[-1,-1].ticklabel_format(axis='x', style='sci', scilimits=(-2,2))
     il = nvpanels-1; ih=0; axarr[il,ih].set_xlabel('time')
     il = nvpanels-2; ih=1; axarr[il,ih].set_xlabel('time')
+    if isinstance(saveit,str):
+        savepng(f,saveit)
+    elif (saveit):
+        savepng(f,fileroot+'.png')
+    if (fast):
+        return f
 
 
 
@@ -480,33 +653,47 @@ def precess_ang(lx,ly,lz,ex_x,ex_y,ex_z,ey_x,ey_y,ey_z):
     return prec_ang
 
 
-# median filter an angle (like the precession angle), returing precession rate, cleaned
+# precession rate from an angle (like the precession angle), at every sample
+# least squares slope of the unwrapped angle over windows of boxsize samples
+# (see ratesubs.py), tt need not be evenly spaced
 def prec_dphidt(tt,prec_ang,boxsize):
-    dt = tt[1] - tt[0]
-    nn = np.size(tt)
-    dphidt =np.diff(prec_ang)/dt  # precession rate
-    dphidt =np.append(dphidt,dphidt[nn-2])# so array the same size all others 
-    mf = median_filter(dphidt,boxsize)
-    return mf
+    return angle_rate(tt,prec_ang,boxsize)
 
     
+# principal axes for a whole time series of moment of inertia tensors
+# the tensors are put in an (N,3,3) stack and diagonalized in one call
+# returns eigenvalues I3,I2,I1 (max,med,min) as (N,) arrays and
+# eigenvectors vmax,vmin,vmed as (N,3) unit vectors
+# with continuous=True the sign of each eigenvector is chosen so that it
+# does not flip from one sample to the next
+# scalar I components give (3,) eigenvectors
+def principal_axes(Ixx,Iyy,Izz,Ixy,Iyz,Ixz,continuous=True):
+    Ixx = np.asarray(Ixx,dtype=float)
+    Imat = np.empty(Ixx.shape + (3,3))
+    Imat[...,0,0] = Ixx; Imat[...,0,1] = Ixy; Imat[...,0,2] = Ixz
+    Imat[...,1,0] = Ixy; Imat[...,1,1] = Iyy; Imat[...,1,2] = Iyz
+    Imat[...,2,0] = Ixz; Imat[...,2,1] = Iyz; Imat[...,2,2] = Izz
+    w, v = LA.eigh(Imat)  # eigenvalues in ascending order, eigenvecs v[...,:,i] unit length
+    if (continuous) and (v.ndim == 3) and (len(v) > 1):
+        # sign of overlap of each eigenvector with the one at the previous sample
+        sg = np.sign(np.einsum('nij,nij->nj',v[1:],v[:-1]))
+        sg[sg==0] = 1.0
+        sg = np.concatenate((np.ones((1,3)),np.cumprod(sg,axis=0)))
+        v *= sg[:,None,:]
+    vmax = np.ascontiguousarray(v[...,:,2])
+    vmin = np.ascontiguousarray(v[...,:,0])
+    vmed = np.ascontiguousarray(v[...,:,1])
+    return w[...,2],w[...,1],w[...,0],vmax,vmin,vmed
+
 # at index j from moments of inertia arrays
 # return eigenvector of max eigen value 
 #    and eigenvector of min eigen value
 #    and eigenvector of middle eigen value
 # should now work if some eigenvalues are same as others
 # these are the principal body axes
+# for many indices use principal_axes() instead
 def evec(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
-    Imat = np.matrix([[Ixx[j],Ixy[j],Ixz[j]],\
-         [Ixy[j],Iyy[j],Iyz[j]],[Ixz[j],Iyz[j],Izz[j]]])
-    w, v = LA.eig(Imat)  # eigenvecs v are unit length 
-    jsort = np.argsort(w) # arguments of a sorted array of eigenvalues
-    jmax = jsort[2]  # index of maximum eigenvalue
-    jmin = jsort[0]  # index of minimum eigenvalue
-    jmed = jsort[1]  # index of middle  eigenvalue
-    vmax = np.squeeze(np.asarray(v[:,jmax]))   # corresponding eigenvector
-    vmin = np.squeeze(np.asarray(v[:,jmin]))   # corresponding eigenvector
-    vmed = np.squeeze(np.asarray(v[:,jmed]))   # corresponding eigenvector
+    I3,I2,I1,vmax,vmin,vmed = principal_axes(Ixx[j],Iyy[j],Izz[j],Ixy[j],Iyz[j],Ixz[j])
     return vmax,vmin,vmed
 
 
@@ -515,29 +702,35 @@ def evec(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
 # order max,med,min
 # these are I3,I2,I1 in order moments of inertia in body frame
 def I3I2I1(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
-    Imat = np.matrix([[Ixx[j],Ixy[j],Ixz[j]],\
-         [Ixy[j],Iyy[j],Iyz[j]],[Ixz[j],Iyz[j],Izz[j]]])
-    w, v = LA.eig(Imat)
-    jsort = np.argsort(w) # arguments of a sorted array of eigenvalues
-    jmax = jsort[2]  # index of maximum eigenvalue
-    jmin = jsort[0]  # index of minimum eigenvalue
-    jmed = jsort[1]  # index of middle  eigenvalue
-    return w[jmax],w[jmed],w[jmin]
+    I3,I2,I1,vmax,vmin,vmed = principal_axes(Ixx[j],Iyy[j],Izz[j],Ixy[j],Iyz[j],Ixz[j])
+    return I3,I2,I1
+
 
+# eigenvalues and eigenvectors at index j, taken from axes
+# (output of principal_axes) if given, otherwise computed
+def axes_at(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,axes=None):
+    if (axes is None):
+        return principal_axes(Ixx[j],Iyy[j],Izz[j],Ixy[j],Iyz[j],Ixz[j])
+    return tuple(a[j] for a in axes)
 
 # to help give angles between 0 and pi/2
-def piminus(ang):
-    x = ang
-    if (ang > np.pi/2.0):   # if angle greater than pi/2 returns pi-angle
-        x = np.pi - ang
-    return x
+# works on arrays too
+def piminus(ang,out=None):
+    # if angle greater than pi/2 returns pi-angle
+    x = np.where(ang > np.pi/2.0, np.pi - ang, ang)
+    if (out is None):
+        return x[()]
+    out[...] = x
+    return out
 
 # body tilt angles with respect to body spin angular momentum and spin vectors
 #   at index j 
 # return acos of dot prod of spin omega with max principal axis
 # return acos of dot prod of spin angular momentum with max principal axis
 # and also returns same acosines for min and medium principal axis directions
-def tilts(j,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
+# axes is optional output of principal_axes() for all indices, to avoid
+# diagonalizing the tensor again
+def tilts(j,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,axes=None):
     slen = len_vec(omx[j],omy[j],omz[j])
     nox = omx[j]/slen;   # direction of omega (spin)
     noy = omy[j]/slen;
@@ -546,8 +739,8 @@ def tilts(j,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
     nlx = llx[j]/llen  # direction of spin angular momentum
     nly = lly[j]/llen
     nlz = llz[j]/llen
-    vmax,vmin,vmed = evec(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz)  
-    # evec returns eigenvectors of max and min and med eigenvalue of I matrix
+    I3,I2,I1,vmax,vmin,vmed = axes_at(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,axes)
+    # eigenvectors of max and min and med eigenvalue of I matrix
     ds_ma =  dotprod(vmax[0],vmax[1],vmax[2],nox,noy,noz);  # cos = omega dot vmax
     dl_ma =  dotprod(vmax[0],vmax[1],vmax[2],nlx,nly,nlz);  # cos = angmom dot vmax
     # note that dl_ma is equivalent to cos J, 
@@ -569,8 +762,9 @@ def tilts(j,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
 # return the angle l conjugate to L (see page 86 of Celletti's book)
 #   at array index j
 # see Figure 5.2 by Celletti
-def ll_vec(j,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
-    vmax,vmin,vmed = evec(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz)  # body axis vectors
+# axes as for tilts()
+def ll_vec(j,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,axes=None):
+    I3,I2,I1,vmax,vmin,vmed = axes_at(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,axes)  # body axis vectors
     llen = len_vec(llx[j],lly[j],llz[j])
     nlx = llx[j]/llen  # direction of spin angular momentum
     nly = lly[j]/llen
@@ -588,15 +782,15 @@ def ll_vec(j,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
 # using equations on page 88 of book by Celletti but averaging
 # over possible values for l
 # at index j
-def body_precs(j,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
-    I3,I2,I1 = I3I2I1(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz) 
+# axes as for tilts()
+def body_precs(j,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,axes=None):
+    I3,I2,I1,vmax,vmin,vmed = axes_at(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,axes)
     llen = len_vec(llx[j],lly[j],llz[j])
     G= llen   # spin angular momentum, and Andoyer Deprit variable
     nlx = llx[j]/llen  # direction of spin angular momentum
     nly = lly[j]/llen
     nlz = llz[j]/llen
-    vmax,vmin,vmed = evec(j,Ixx,Iyy,Izz,Ixy,Iyz,Ixz)  
-    # evec returns eigenvectors of max and min and med eigenvalue of I matrix
+    # vmax,vmin,vmed are eigenvectors of max and min and med eigenvalue of I matrix
     cosJ =  dotprod(vmax[0],vmax[1],vmax[2],nlx,nly,nlz);  # cos = angmom dot vmax
     # J is the so-called non-principal rotation angle
     # see page 86 in Celletti's book
@@ -615,52 +809,61 @@ def body_precs(j,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
 # the angles are those between omega and eigendirections
 #  or those between spin and eigendirections
 # the eigendirections are the principal axes
-def vec_tilts(k,tt,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz):
+# also returns the ll_vec angle and gdot,ldot,lambda1dot of body_precs
+# everything is done with array operations, into one preallocated output array
+# the tensors are diagonalized once, or axes from principal_axes() can be given
+# (for all indices, not only every k-th one)
+def vec_tilts(k,tt,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,axes=None):
     nn = np.size(tt)
-    nt = np.int(nn/k)
-    svec_ma=[]
-    lvec_ma=[]
-    svec_mi=[]
-    lvec_mi=[]
-    svec_me=[]
-    lvec_me=[]
-    tvec=[]
-    ang_ll_vec = []
-    gdot_vec =[]
-    ldot_vec =[]
-    lam1dot_vec = []
-    omvec = np.sqrt(omx*omx + omy*omy + omz*omz)
-    Gvec = np.sqrt(llx*llx + lly*lly + llz*llz)
-    spin_vec = []
-    for i in range(nt):
-        j = k*i
-        angs_ma,angl_ma,angs_mi,angl_mi,angs_me,angl_me =\
-              tilts(j,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz) 
-        svec_ma = np.append(svec_ma,angs_ma)  #largest
-        lvec_ma = np.append(lvec_ma,angl_ma)
-        svec_mi = np.append(svec_mi,angs_mi)  #smallest
-        lvec_mi = np.append(lvec_mi,angl_mi)
-        svec_me = np.append(svec_me,angs_me)  #medium
-        lvec_me = np.append(lvec_me,angl_me)
-        spin_vec = np.append(spin_vec,omvec[j])
-        tvec = np.append(tvec,tt[j])  #time
-        ang_ll = ll_vec(j,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz) 
-        ang_ll_vec = np.append(ang_ll_vec,ang_ll)
-        gdot,ldot,lam1dot = body_precs(j,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz) 
-        gdot_vec=np.append(gdot_vec,gdot)
-        ldot_vec=np.append(ldot_vec,ldot)
-        lam1dot_vec=np.append(lam1dot_vec,lam1dot)
+    nt = int(nn/k)
+    js = k*np.arange(nt)  # indices used
+    if (axes is None):
+        axes = principal_axes(Ixx[js],Iyy[js],Izz[js],Ixy[js],Iyz[js],Ixz[js])
+    else:
+        axes = tuple(a[js] for a in axes)
+    I3,I2,I1,vmax,vmin,vmed = axes
+    omv = np.stack((omx[js],omy[js],omz[js]),axis=-1)
+    llv = np.stack((llx[js],lly[js],llz[js]),axis=-1)
+    out = np.empty((12,nt))
+    tvec,svec_ma,lvec_ma,svec_mi,lvec_mi,svec_me,lvec_me,ang_ll_vec,\
+        gdot_vec,ldot_vec,lam1dot_vec,spin_vec = out
+    tvec[:] = tt[js]  #time
+    len_vec_arr(omv,out=spin_vec)
+    Gvec = len_vec_arr(llv)  # spin angular momentum, and Andoyer Deprit variable
+    nov = np.divide(omv,spin_vec[:,None],out=omv)  # direction of omega (spin)
+    nlv = np.divide(llv,Gvec[:,None],out=llv)      # direction of spin angular momentum
+    # angles between principal axes and omega or spin angular momentum
+    # in range [0,pi/2], see tilts()
+    for vaxis,svec,lvec in ((vmax,svec_ma,lvec_ma),(vmin,svec_mi,lvec_mi),(vmed,svec_me,lvec_me)):
+        piminus(np.arccos(dotprod_arr(vaxis,nov,out=svec),out=svec),out=svec)
+        piminus(np.arccos(dotprod_arr(vaxis,nlv,out=lvec),out=lvec),out=lvec)
+    # angle l conjugate to L, see ll_vec()
+    ndd = crossprod_unit_arr(vmax,nlv)
+    piminus(np.arccos(dotprod_arr(vmin,ndd,out=ang_ll_vec),out=ang_ll_vec),out=ang_ll_vec)
+    # averaged Andoyer Deprit rates, see body_precs()
+    cosJ = dotprod_arr(vmax,nlv)
+    L = np.abs(Gvec*cosJ)
+    inv_I_med = 0.5*(1.0/I1 + 1.0/I2)
+    np.multiply(Gvec,inv_I_med,out=gdot_vec)
+    np.subtract(L/I3,L*inv_I_med,out=ldot_vec)
+    np.add(gdot_vec,ldot_vec,out=lam1dot_vec)
 
     return tvec,svec_ma,lvec_ma,svec_mi,lvec_mi,svec_me,lvec_me,ang_ll_vec,gdot_vec,ldot_vec,lam1dot_vec,spin_vec
 
 
 
 # compute orbital elements for com of resolved and first mass w.r.t to another mass
-def orbel_com(fileroot,numberpm,ip):
+# dec is the decimation mode and tmin,tmax the time window as for orbels_arr
+def orbel_com(fileroot,numberpm,ip,dec=None,tmin=None,tmax=None,kk=None):
+    if (dec is None):
+        dec = dec_mode
+    nl,i0 = run_window(fileroot,numberpm,tmin,tmax)
+    if (kk is None):
+        kk = run_rows(fileroot,nl,dec,dec_key,i0)  # stride or rows to keep
     t,x,y,z,vx,vy,vz,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,KErot,PEspr,PEgrav,Etot,dEdt=\
-       readresfile(fileroot)  # resolved body stuff
+       readresfile(fileroot,kk,nl)  # resolved body stuff
     tt, mvec, xarr,yarr,zarr,vxarr,vyarr,vzarr=\
-       readallpmfiles(fileroot,numberpm)  # point mass stuff
+       readallpmfiles(fileroot,numberpm,kk,nl)  # point mass stuff
     m0 = 1.0
     m1 = mvec[0]
     M = m0+m1
@@ -675,25 +878,295 @@ def orbel_com(fileroot,numberpm,ip):
     dxarr = x0-np.squeeze( xarr[ip]);  dyarr= y0-np.squeeze( yarr[ip]);  dzarr= z0-np.squeeze( zarr[ip]);
     dvxarr=vx0-np.squeeze(vxarr[ip]); dvyarr=vy0-np.squeeze(vyarr[ip]); dvzarr=vz0-np.squeeze(vzarr[ip]);
 
-    nl = len(tt)
-    kk = np.int(nl/plmax)    # reduce array sizes by this interval!
-    if (kk<1): 
-        kk=1
-
-    ts = t[0::kk]  # short time array
-    dxarr   = dxarr[0::kk];  dyarr =  dyarr[0::kk];  dzarr =  dzarr[0::kk]
-    dvxarr = dvxarr[0::kk]; dvyarr = dvyarr[0::kk]; dvzarr = dvzarr[0::kk]
-    aaarr_p = dxarr*0.0; eearr_p = dxarr*0.0; iiarr_p = dxarr*0.0;
-    lnarr_p = dxarr*0.0; ararr_p = dxarr*0.0; maarr_p = dxarr*0.0;
-    for k in range(len(dxarr)):
-        aa,ee,ii,longnode,argperi,meananom=\
-               keplerian(M +mvec[ip],dxarr[k],dyarr[k],dzarr[k],dvxarr[k],dvyarr[k],dvzarr[k])
-        aaarr_p[k] = aa
-        eearr_p[k] = ee
-        iiarr_p[k] = ii
-        lnarr_p[k] = longnode
-        ararr_p[k] = argperi 
-        maarr_p[k] = meananom 
+    ts = t  # short time array
+    aaarr_p,eearr_p,iiarr_p,lnarr_p,ararr_p,maarr_p=\
+           keplerian(M +mvec[ip],dxarr,dyarr,dzarr,dvxarr,dvyarr,dvzarr)
     return ts,aaarr_p,eearr_p,iiarr_p,lnarr_p,ararr_p,maarr_p
 
 
+
+
+# derived quantities at every row of a run, kept on disk next to the outputs
+# (in directory fileroot_derived, see dercache.py) and extended as the run grows
+# only rows appended since the last call are read and computed
+# the stored rows are checked against a sha1 fingerprint of the part of
+# each file they were computed from, if a file was changed (or rewritten by
+# a new run) rather than appended to, everything is recomputed
+# a file whose size and modification time (file_stamp) are those stored is
+# taken as untouched and not hashed, so a store that is up to date is
+# checked without reading the files
+der_rows = 100000   # number of rows read and computed at a time
+
+def derived_dirname(fileroot):
+    return fileroot+'_derived'
+
+def run_files(fileroot,numberpm):
+    return [fileroot+'_ext.txt'] + [pmfilename(fileroot,i) for i in range(numberpm)]
+
+# names of the stored series, orbital elements are aa0, aa1, ... one per
+# point mass index as in orbels_arr (resolved body in index 0)
+def derived_names(numberpm):
+    names = ['t','dEdt','obliquity','spin','Jvec','prec_ang','phi_Eu','theta_Eu','bphi_Eu',\
+        'I3','I2','I1']
+    for el in ('aa','ee','ii','ln','ar','ma'):
+        names += ['%s%d'%(el,i) for i in range(numberpm)]
+    return names
+
+# derived quantities for a block of consecutive rows, as in orbels_arr
+# res is the (ncols,n) array of the _ext.txt columns and pms is a list of
+# (8,n) arrays of the point mass file columns
+# axes0 = (vmax,vmin,vmed) at the row before the block, used to choose
+# the signs of the eigenvectors so they carry on without a flip
+# iE is the index of the dEdt column (from the header, see derived_series)
+# returns a dictionary name -> (n,) array and the axes at the last row
+def derived_block(res,pms,axes0,iE):
+    t,x,y,z,vx,vy,vz,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz = res[:19]
+    dEdt = res[iE]
+    numberpm = len(pms)
+    mvec = np.array([pm[7][0] for pm in pms])
+    xarr,yarr,zarr,vxarr,vyarr,vzarr = [np.array([pm[k] for pm in pms]) for k in range(1,7)]
+    imc = 0  # index of central mass
+    els = run_orbels(mvec,xarr,yarr,zarr,vxarr,vyarr,vzarr,x,y,z,vx,vy,vz,imc)
+    dxarr = x- xarr[imc];  dyarr= y- yarr[imc];  dzarr= z- zarr[imc]
+    dvxarr=vx-vxarr[imc]; dvyarr=vy-vyarr[imc]; dvzarr=vz-vzarr[imc]
+    no_x,no_y,no_z=crossprod_unit(dxarr,dyarr,dzarr,dvxarr,dvyarr,dvzarr)  #orbit normal
+    nlx,nly,nlz = normalize_vec(llx,lly,llz) # body spin angular momentum unit vector
+    cols = {'t':t, 'dEdt':dEdt}
+    cols['obliquity'] = np.arccos(dotprod(nlx,nly,nlz,no_x,no_y,no_z))*angfac
+    cols['spin'] = len_vec(omx,omy,omz)
+    axes = principal_axes(Ixx,Iyy,Izz,Ixy,Iyz,Ixz)
+    I3,I2,I1,vmax,vmin,vmed = axes
+    if (axes0 is not None):
+        for v,v0 in zip((vmax,vmin,vmed),axes0):
+            if (np.dot(v[0],v0) < 0):
+                v *= -1.0
+    cols['Jvec'] = vec_tilts(1,t,omx,omy,omz,llx,lly,llz,Ixx,Iyy,Izz,Ixy,Iyz,Ixz,axes)[2]
+    cols['prec_ang'] = precess_ang(llx,lly,llz,1.0,0.0,0.0,0.0,1.0,0.0)
+    cols['phi_Eu'] = np.arctan2(vmin[:,1],vmin[:,0])
+    cols['theta_Eu'] = np.arccos(vmax[:,2])
+    cols['bphi_Eu'] = np.arctan2(vmax[:,1],vmax[:,0])
+    cols['I3'] = I3; cols['I2'] = I2; cols['I1'] = I1
+    for el,arr in zip(('aa','ee','ii','ln','ar','ma'),els):
+        for i in range(numberpm):
+            cols['%s%d'%(el,i)] = arr[i]
+    return cols,(vmax[-1],vmin[-1],vmed[-1])
+
+# bring the store of derived quantities of a run up to date and return it
+# as a dictionary name -> array (see derived_names), every kk-th row
+# (or the rows in index array kk), aa, ee, ... are also given as
+# (numberpm,n) arrays like those of orbels_arr
+def derived_series(fileroot,numberpm,kk=1):
+    dirname = derived_dirname(fileroot)
+    files = run_files(fileroot,numberpm)
+    names = derived_names(numberpm)
+    nl = run_length(fileroot,numberpm)
+    meta = store_meta(dirname)
+    checked = {}  # prefix hashes computed by the check, reused below
+    if (meta is not None):
+        if (meta['names'] != names) or (meta.get('ref') != pm_ref) or (meta['nrows'] > nl)\
+            or ('files' not in meta):  # nothing appended yet
+            meta = None
+        else:
+            for f in files:
+                fm = meta['files'][f]
+                if (fm.get('stamp') == file_stamp(f)):
+                    continue
+                h = checked[f] = prefix_hash(f,fm['bytes'])
+                if (h is None) or (h.hexdigest() != fm['sha1']):
+                    print("derived_series: %s has changed, recomputing"%f)
+                    meta = None
+                    break
+    if (meta is None):
+        meta = store_create(dirname,names,{'ref':pm_ref})
+    n0 = meta['nrows']
+    if (n0 < nl):
+        header = read_header(files[0])  # dEdt is found by name
+        if 'dEdt' not in header:
+            raise ValueError("%s: no column %r, columns are %s"%(files[0],'dEdt',' '.join(header)))
+        iE = header.index('dEdt')
+        print("derived_series: computing rows %d to %d"%(n0,nl))
+        fps = [open(f,'rb') for f in files]
+        try:
+            # hashes of the part of each file read so far, continued by read_rows
+            if (n0 == 0):  # new store, skip the headers
+                hashes = [prefix_hash(f,0) for f in files]
+                for fp,h in zip(fps,hashes):
+                    h.update(fp.readline())
+                axes0 = None
+            else:
+                hashes = [checked[f] if (f in checked) else prefix_hash(f,meta['files'][f]['bytes']) \
+                    for f in files]
+                for fp,f in zip(fps,files):
+                    fp.seek(meta['files'][f]['bytes'])
+                axes0 = meta['axes']
+            while (n0 < nl):
+                m = min(der_rows,nl-n0)
+                res = read_rows(fps[0],m,hashes[0])
+                pms = [read_rows(fp,m,h) for fp,h in zip(fps[1:],hashes[1:])]
+                cols,axes0 = derived_block(res,pms,axes0,iE)
+                axes0 = [list(v) for v in axes0]
+                fmeta = {f:{'bytes':fp.tell(),'sha1':h.hexdigest(),'stamp':file_stamp(f)} \
+                    for f,fp,h in zip(files,fps,hashes)}
+                meta = store_append(dirname,meta,cols,{'ref':pm_ref,'files':fmeta,'axes':axes0})
+                n0 += m
+        finally:
+            for fp in fps:
+                fp.close()
+    cols = store_load(dirname,meta)
+    cols = {name:np.asarray(col[::kk] if np.ndim(kk)==0 else col[kk]) for name,col in cols.items()}
+    for el in ('aa','ee','ii','ln','ar','ma'):
+        cols[el] = np.array([cols['%s%d'%(el,i)] for i in range(numberpm)])
+    return cols
+
+# remove the stored derived quantities of a run
+def clear_derived(fileroot):
+    store_clear(derived_dirname(fileroot))
+
+
+# one simulation run, derived quantities are computed the first time they are
+# asked for and then kept, so plt_cols, orbel_com, ... on the same run do not
+# re-read the files and redo orbels_arr every time
+# e.g.
+#   run = Run("../phobos2/m3",2)
+#   plt.plot(run.t,run.obliquity)   # reads files, computes all of orbels_arr
+#   plt.plot(run.t,run.spin)        # no work
+#   plt_cols(run.fileroot,run.numberpm,0,0,0,2,1,run=run)
+#   run.release('aa','ee')          # drop some arrays, run.release() drops all
+# dropped quantities are recomputed if they are used again
+class Run:
+    # names of the arrays returned by orbels_arr, in order
+    orbels_names = ('t','mvec','aa','ee','ii','ln','ar','ma','obliquity','spin',\
+        'Jvec','prec_ang','phi_Eu','theta_Eu','bphi_Eu','dEdt','Ivec')
+
+    def __init__(self,fileroot,numberpm,dec=None,tmin=None,tmax=None):
+        self.fileroot = fileroot
+        self.numberpm = numberpm
+        self.dec = dec   # decimation mode, None for dec_mode
+        self.tmin = tmin # time window, None for the whole run
+        self.tmax = tmax
+        self.cache = {}
+        self.released = set()  # names dropped with release()
+
+    def __repr__(self):
+        return "Run(%r,%d) %d cached, %.1f MB"%\
+            (self.fileroot,self.numberpm,len(self.cache),self.nbytes()/1e6)
+
+    # everything orbels_arr returns, as a tuple in its order
+    @property
+    def orbels(self):
+        if not all(name in self.cache for name in self.orbels_names):
+            vals = orbels_arr(self.fileroot,self.numberpm,self.dec,self.tmin,self.tmax,self.kk)
+            self.cache.update(zip(self.orbels_names,vals))
+            self.released.clear()
+        return tuple(self.cache[name] for name in self.orbels_names)
+
+    # a name dropped by release() is recomputed on its own, the other
+    # dropped names stay dropped
+    def get(self,name):
+        if name not in self.cache:
+            if (len(self.released) == 0):
+                self.orbels
+            elif (name in ('t','spin')):  # straight from the columns of _ext.txt
+                cols = readres(self.fileroot,['t','omx','omy','omz'],kk=self.rows)
+                self.cache[name] = np.array(cols['t']) if (name == 't') else \
+                    len_vec(cols['omx'],cols['omy'],cols['omz'])
+            else:
+                vals = orbels_arr(self.fileroot,self.numberpm,self.dec,self.tmin,self.tmax,self.kk)
+                for key,val in zip(self.orbels_names,vals):
+                    if (key == name) or (key not in self.cache and key not in self.released):
+                        self.cache[key] = val
+        self.released.discard(name)
+        return self.cache[name]
+
+    t          = property(lambda self: self.get('t'))
+    mvec       = property(lambda self: self.get('mvec'))
+    aa         = property(lambda self: self.get('aa'))  # (numberpm,ns) arrays
+    ee         = property(lambda self: self.get('ee'))
+    ii         = property(lambda self: self.get('ii'))
+    ln         = property(lambda self: self.get('ln'))
+    ar         = property(lambda self: self.get('ar'))
+    ma         = property(lambda self: self.get('ma'))
+    obliquity  = property(lambda self: self.get('obliquity'))  # degrees
+    spin       = property(lambda self: self.get('spin'))
+    Jvec       = property(lambda self: self.get('Jvec'))
+    prec_ang   = property(lambda self: self.get('prec_ang'))
+    phi_Eu     = property(lambda self: self.get('phi_Eu'))
+    theta_Eu   = property(lambda self: self.get('theta_Eu'))
+    bphi_Eu    = property(lambda self: self.get('bphi_Eu'))
+    dEdt       = property(lambda self: self.get('dEdt'))
+    Ivec       = property(lambda self: self.get('Ivec'))  # I3,I2,I1 at the end
+
+    # decimation of the run, a stride or an array of rows (see run_rows),
+    # found once and used for everything read from the files
+    @property
+    def kk(self):
+        if 'kk' not in self.cache:
+            dec = dec_mode if (self.dec is None) else self.dec
+            nl,i0 = run_window(self.fileroot,self.numberpm,self.tmin,self.tmax)
+            self.cache['kk'] = run_rows(self.fileroot,nl,dec,dec_key,i0)
+            self.cache['nl'] = nl
+        return self.cache['kk']
+
+    # rows of the output files the times t are at
+    @property
+    def rows(self):
+        if 'rows' not in self.cache:
+            kk = self.kk
+            if (np.ndim(kk) == 0):
+                kk = np.arange(0,self.cache['nl'],kk)
+            self.cache['rows'] = kk
+        return self.cache['rows']
+
+    @property
+    def varpi(self):   # longitude of pericenter
+        if 'varpi' not in self.cache:
+            self.cache['varpi'] = self.ln + self.ar
+        return self.cache['varpi']
+
+    @property
+    def meanlongitude(self):
+        if 'meanlongitude' not in self.cache:
+            self.cache['meanlongitude'] = self.varpi + self.ma
+        return self.cache['meanlongitude']
+
+    # elements of com of resolved body and central mass w.r.t point mass ip
+    def com(self,ip):
+        name = 'com%d'%ip
+        if name not in self.cache:
+            self.cache[name] = orbel_com(self.fileroot,self.numberpm,ip,self.dec,self.tmin,self.tmax,self.kk)
+        return self.cache[name]
+
+    # drop cached quantities by name to free memory, no names drops all
+    # (and the next access loads everything again)
+    def release(self,*names):
+        if (len(names) == 0):
+            self.cache.clear()
+            self.released.clear()
+            return
+        for name in names:
+            self.cache.pop(name,None)
+            self.released.add(name)
+
+    # obliquity (degrees), spin and Jvec, what give_body_angs() returns
+    def body_angs(self):
+        return self.obliquity,self.spin,self.Jvec
+
+    # derived quantities at every row (every kk-th), from the on-disk store
+    # that is extended as the run grows, see derived_series()
+    def series(self,kk=1):
+        if (np.ndim(kk) != 0):  # rows given by an index array, not kept
+            return derived_series(self.fileroot,self.numberpm,kk)
+        name = 'series%d'%kk
+        if name not in self.cache:
+            self.cache[name] = derived_series(self.fileroot,self.numberpm,kk)
+        return self.cache[name]
+
+    # memory used by the cached arrays in bytes
+    def nbytes(self):
+        nb = 0
+        for val in self.cache.values():
+            if isinstance(val,dict):
+                val = tuple(val.values())
+            vals = val if isinstance(val,tuple) else (val,)
+            nb += sum(np.asarray(v).nbytes for v in vals)
+        return nb
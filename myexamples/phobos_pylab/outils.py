@@ -1,26 +1,18 @@
 
 import numpy as np
+from angsubs import wrap_two_pi
 
 angfac = 180.0/np.pi
 
 # some useful subroutines
 
-# get an angle between [0,2pi]
+# get an angle between [0,2pi)
+# works on scalars or arrays, see angsubs.py for more angle routines
 def mod_two_pi(x):
-    twopi = 2.0*np.pi
-    y=x
-    while (y > twopi):
-        y -= twopi;
-    while (y < 0.0):
-        y += twopi;
-    return y
-
-def mod_two_pi_arr(x):
-    nvec = np.size(x)
-    mvec = x*0.0
-    for i in range(0,nvec):
-        mvec[i] = mod_two_pi(x[i])
-    return mvec
+    return wrap_two_pi(x)
+
+def mod_two_pi_arr(x,out=None):
+    return wrap_two_pi(x,out=out)
 
 # length of a vector
 def len_vec(x,y,z):
@@ -68,5 +60,53 @@ def apar(ax,ay,az,bx,by,bz):
     cy = z*by/bmag
     cz = z*bz/bmag
     return cx,cy,cz
-    
 
+
+# the routines below work on vectors stored as (N,3) arrays (or a single (3,) vector)
+# rather than as separate x,y,z components, so a whole time series is one array
+# optional out= arrays let results go into preallocated buffers
+
+# length of vectors, returns (N,) (a scalar for a single vector)
+def len_vec_arr(a,out=None):
+    a = np.asarray(a)
+    r2 = np.einsum('...i,...i->...',a,a,out=out)
+    return np.sqrt(r2,out=out)
+
+# normalize vectors, out may be a itself
+def normalize_vec_arr(a,out=None):
+    r = len_vec_arr(a)
+    return np.divide(a,r[...,None],out=out)
+
+# dot product of vectors, returns (N,)
+def dotprod_arr(a,b,out=None):
+    return np.einsum('...i,...i->...',a,b,out=out)
+
+# cross product of vectors, out must not be a or b
+def crossprod_arr(a,b,out=None):
+    a = np.asarray(a); b = np.asarray(b)
+    if (out is None):
+        out = np.empty(np.broadcast_shapes(a.shape,b.shape))
+    tmp = np.empty(out.shape[:-1])
+    for k in range(3):
+        k1 = (k+1)%3; k2 = (k+2)%3
+        np.multiply(a[...,k1],b[...,k2],out=out[...,k])
+        np.multiply(a[...,k2],b[...,k1],out=tmp)
+        out[...,k] -= tmp
+    return out
+
+# normalized cross product of vectors
+def crossprod_unit_arr(a,b,out=None):
+    out = crossprod_arr(a,b,out=out)
+    return normalize_vec_arr(out,out=out)
+
+# the part of a that is perpendicular to the direction of b
+# (aperp assumes b is a unit vector, this does not)
+def aperp_arr(a,b,out=None):
+    out = apar_arr(a,b,out=out)
+    return np.subtract(a,out,out=out)
+
+# the part of a that is parallel to the direction of b
+def apar_arr(a,b,out=None):
+    b = np.asarray(b)
+    fac = dotprod_arr(a,b)/dotprod_arr(b,b)
+    return np.multiply(b,fac[...,None],out=out)
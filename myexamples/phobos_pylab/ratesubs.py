@@ -0,0 +1,81 @@
+import numpy as np
+
+from angsubs import * # angle wrapping routines
+
+# rates of change of angles (precession angle, longitudes of node and
+# pericenter, Euler angles, ...) from their time series
+# the angle is unwrapped and its slope is fit by least squares over a
+# sliding window of w samples centred on each sample (shifted to stay
+# inside the series at the ends)
+# times need not be evenly spaced, the fit is in t
+# window sums come from cumulative sums, so the cost is O(n) whatever w,
+# done in chunks with a local origin to keep the sums accurate
+
+slope_chunk = 8192   # min samples per chunk of window sums
+
+# least squares slope of y(t) over every window of w consecutive samples,
+# returns n-w+1 slopes (nan where all times in a window are the same)
+def window_slopes(t,y,w):
+    t = np.asarray(t,dtype=float); y = np.asarray(y,dtype=float)
+    n = len(t)
+    nwin = n-w+1
+    s = np.empty(max(nwin,0))
+    nchunk = max(slope_chunk,32*w)
+    for k0 in range(0,nwin,nchunk):
+        k1 = min(k0+nchunk,nwin)
+        tc = t[k0:k1+w-1] - t[k0]
+        yc = y[k0:k1+w-1] - y[k0]
+        sums = []
+        for a in (tc,yc,tc*tc,tc*yc):
+            cs = np.concatenate(([0.0],np.cumsum(a)))
+            sums.append(cs[w:] - cs[:-w])
+        St,Sy,Stt,Sty = sums
+        den = w*Stt - St*St
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s[k0:k1] = np.where(den > 0, (w*Sty - St*Sy)/den, np.nan)
+    return s
+
+# slope of y(t) at every sample, from windows of w samples (w made odd)
+def local_slopes(t,y,w):
+    n = len(t)
+    if (n < 2):
+        return np.zeros(n)
+    w = min(int(w) | 1, n)
+    s = window_slopes(t,y,w)
+    start = np.clip(np.arange(n) - w//2, 0, n-w)  # window used by each sample
+    return s[start]
+
+# unwrap an angle series phi(t)
+# without rate, jumps of more than pi between samples are taken to be wraps
+# with a rate (at every sample) the jump expected from the rate is taken
+# out first, so an angle can turn by more than pi between samples (large
+# or uneven time steps) and still be unwrapped correctly
+def unwrap_phase(t,phi,rate=None):
+    phi = np.asarray(phi,dtype=float)
+    if (rate is None) or (len(phi) < 2):
+        return unwrap_ang(phi)
+    dt = np.diff(t)
+    pred = 0.5*(rate[1:] + rate[:-1])*dt   # expected change over each step
+    d = pred + wrap_pi(np.diff(phi) - pred)
+    out = np.empty(len(phi))
+    out[0] = phi[0]
+    np.cumsum(d,out=out[1:])
+    out[1:] += phi[0]
+    return out
+
+# rate of change dphi/dt of an angle series at every sample
+# slopes over windows of w samples of the unwrapped angle
+# with passes > 1 the angle is unwrapped again using the rate from the
+# previous pass (see unwrap_phase), for angles that turn quickly
+# an angle turning by more than pi per step is aliased unless a first
+# guess rate0 (number or array, e.g. a peak from specsubs.py) is given
+def angle_rate(t,phi,w,passes=2,rate0=None):
+    t = np.asarray(t,dtype=float)
+    rate = None
+    if (rate0 is not None):
+        rate = np.broadcast_to(np.asarray(rate0,dtype=float),t.shape)
+    for i in range(passes):
+        rate = local_slopes(t,unwrap_phase(t,phi,rate),w)
+        if np.any(np.isnan(rate)):
+            break
+    return rate
@@ -0,0 +1,575 @@
+import numpy as np
+import os
+import json
+import hashlib
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+# routines for reading the text outputs of the simulations
+# (fileroot_ext.txt, fileroot_pm0.txt, ...)
+
+# text files are read in chunks of about this many bytes
+# this sets the peak memory used while reading, whatever the file size
+chunk_bytes = 32*1024*1024
+
+# count the complete (newline terminated) data lines in a file
+# a partly written last line of a run that is still going is not counted
+# an up to date binary cache is used if there is one, else the row index
+# (so only the part of the file added since the last count is scanned)
+def count_rows(filename,skiprows=1):
+    if (use_cache):
+        cols = read_cache(filename)
+        if (cols is not None):
+            return cols.shape[1]
+    if (use_rowidx):
+        try:
+            return row_index(filename,skiprows)[1]
+        except OSError:
+            pass
+    nl = 0
+    with open(filename,'rb') as fp:
+        while True:
+            block = fp.read(1024*1024)
+            if not block:
+                break
+            nl += block.count(b'\n')
+    return max(nl - skiprows,0)
+
+# move an open (binary) file past its next n lines, without parsing them
+def skip_lines(fp,n):
+    while (n > 0):
+        pos = fp.tell()
+        block = fp.read(1024*1024)
+        if not block:
+            return
+        nl = np.flatnonzero(np.frombuffer(block,dtype=np.uint8) == 10)
+        if (len(nl) < n):
+            n -= len(nl)
+            continue
+        fp.seek(pos + nl[n-1] + 1)
+        return
+
+# generator giving the data of a text file in chunks of rows
+# each chunk is an (ncols,n) array, like np.loadtxt(unpack=True)
+# chunk size is set by nbytes (default chunk_bytes)
+# rows before start_row are skipped without being parsed (reached with
+# a seek from the row index if use_rowidx)
+# rows up to max_rows (counted from the first row of the file) are returned
+# usecols is an optional list of column indices to parse, the others are skipped
+# a truncated or malformed last line (run still writing) is dropped
+def iter_chunks(filename,skiprows=1,nbytes=None,max_rows=None,usecols=None,start_row=0):
+    if (nbytes is None):
+        nbytes = chunk_bytes
+    nread = start_row
+    ncols = 0
+    offset = None
+    if (use_rowidx) and (start_row > 0):
+        try:
+            offset = row_offset(filename,start_row,skiprows)
+        except OSError:
+            pass
+    with open(filename,'rb') as fp:
+        if (offset is None):
+            for i in range(skiprows):
+                fp.readline()
+            skip_lines(fp,start_row)
+        else:
+            fp.seek(offset)
+        while True:
+            lines = fp.readlines(nbytes)
+            if (len(lines) == 0):
+                break
+            if (ncols == 0):
+                ncols = len(lines[0].split())
+            if (not lines[-1].endswith(b'\n')) or (len(lines[-1].split()) != ncols):
+                lines.pop()  # can only happen at the end of the file
+            if (max_rows is not None):
+                lines = lines[:max_rows - nread]
+            if (len(lines) == 0):
+                break
+            data = np.loadtxt(lines, ndmin=2, usecols=usecols)
+            nread += len(lines)
+            yield np.ascontiguousarray(data.T)
+            if (max_rows is not None) and (nread >= max_rows):
+                break
+
+# same as iter_chunks but the chunks are slices of the binary cache when it
+# is up to date (no parsing), the cache is not built if there is none
+def iter_cols(filename,skiprows=1,max_rows=None,usecols=None,start_row=0):
+    cols = read_cache(filename) if (use_cache) else None
+    if (cols is None):
+        yield from iter_chunks(filename,skiprows,max_rows=max_rows,usecols=usecols,start_row=start_row)
+        return
+    n = cols.shape[1] if (max_rows is None) else min(max_rows,cols.shape[1])
+    step = max(chunk_bytes//(8*cols.shape[0]),1)
+    for i in range(start_row,n,step):
+        chunk = cols[:,i:min(i+step,n)]
+        yield chunk if (usecols is None) else chunk[usecols]
+
+# the rows of chunk (an (ncols,n) array starting at row i0 of a file) that are
+# wanted, kk is either a stride (keep every kk-th row of the file)
+# or a sorted array of row indices
+def select_rows(chunk,i0,kk):
+    if np.ndim(kk) == 0:
+        return chunk[:,(-i0)%kk::kk]
+    j0,j1 = np.searchsorted(kk,(i0,i0+chunk.shape[1]))
+    return chunk[:,kk[j0:j1]-i0]
+
+# first row wanted, for a stride or an array of rows kk
+def first_row(kk):
+    if (np.ndim(kk) == 0) or (len(kk) == 0):
+        return 0
+    return int(kk[0])
+
+# read every kk-th row of a text file (starting at the first)
+# kk can also be a sorted array of the row indices to keep
+# only one chunk of the file is held in memory at a time
+# rows that start later in the file (a time window) are read on their own
+# if there is no up to date cache, rather than building it from the whole file
+# returns an (ncols,n) array
+def read_decimated(filename,kk=1,skiprows=1,max_rows=None):
+    cols = cached_cols(filename,kk,skiprows)
+    if (cols is not None):
+        if (max_rows is not None):
+            cols = cols[:,:max_rows]
+        return np.array(select_rows(cols,0,kk))
+    parts = []
+    i0 = first_row(kk)  # row index of start of chunk
+    for chunk in iter_chunks(filename,skiprows,max_rows=max_rows,start_row=i0):
+        n = chunk.shape[1]
+        parts.append(select_rows(chunk,i0,kk).copy())
+        i0 += n
+    if (len(parts) == 0):
+        return np.zeros((0,0))
+    return np.concatenate(parts,axis=1)
+
+
+# binary cache of text outputs
+# the first time a text file is read it is parsed in chunks and saved,
+# one column per row, as filename.npy next to it, with its size and
+# modification time in filename.npy.json
+# later reads memory-map the .npy file, so they are nearly instant
+# if the text file changes size or mtime the cache is rebuilt
+# if the cache cannot be written the text file is just parsed
+use_cache = True
+
+def cache_names(filename):
+    return filename+'.npy', filename+'.npy.json'
+
+# size and modification time of a file, used to decide if a cache is stale
+def file_stamp(filename):
+    st = os.stat(filename)
+    return {'size':st.st_size, 'mtime_ns':st.st_mtime_ns}
+
+# return the cached columns of filename if the cache is up to date, else None
+def read_cache(filename):
+    npyname,metaname = cache_names(filename)
+    try:
+        with open(metaname) as fp:
+            meta = json.load(fp)
+        if (meta['stamp'] != file_stamp(filename)):
+            return None
+        return np.load(npyname, mmap_mode='r')[:,:meta['shape'][1]]
+    except (OSError, ValueError, KeyError):
+        return None
+
+# parse filename chunk by chunk straight into a memory-mapped cache file
+# returns the memory-mapped columns, or None if the cache cannot be written
+def write_cache(filename,skiprows,stamp):
+    npyname,metaname = cache_names(filename)
+    nrows = count_rows(filename,skiprows)
+    ncols = 0
+    with open(filename,'rb') as fp:
+        for i in range(skiprows):
+            fp.readline()
+        ncols = len(fp.readline().split())
+    try:
+        tmpname = npyname+'.tmp.npy'
+        cols = np.lib.format.open_memmap(tmpname, mode='w+', dtype=float, shape=(ncols,nrows))
+        i0 = 0
+        reader = iter_chunks if (parse_pool is None) else iter_parallel
+        for chunk in reader(filename,skiprows,max_rows=nrows):
+            cols[:,i0:i0+chunk.shape[1]] = chunk
+            i0 += chunk.shape[1]
+        cols.flush()
+        del cols
+        os.replace(tmpname,npyname)
+        with open(metaname+'.tmp','w') as fp:
+            json.dump({'stamp':stamp, 'shape':[ncols,i0]},fp)
+        os.replace(metaname+'.tmp',metaname)
+    except OSError as err:
+        print("could not write cache for %s: %s"%(filename,err))
+        return None
+    cols = np.load(npyname, mmap_mode='r')
+    return cols[:,:i0]
+
+# read a text output file with a one line header
+# returns an (ncols,nrows) array, each row a column of the file
+# (so it can be unpacked like np.loadtxt(unpack=True))
+def loadcols(filename,skiprows=1):
+    if (use_cache):
+        cols = read_cache(filename)
+        if (cols is not None):
+            return cols
+        stamp = file_stamp(filename)
+        cols = write_cache(filename,skiprows,stamp)
+        if (cols is not None):
+            return cols
+    if (parse_pool is not None):
+        return read_parallel(filename,skiprows)
+    parts = list(iter_chunks(filename,skiprows))
+    if (len(parts) == 0):
+        return np.zeros((0,0))
+    return np.concatenate(parts,axis=1)
+
+# the cached columns to read rows kk from, None to parse the file instead
+# the cache is built if needed, unless the first row wanted is past the
+# start of the file (e.g. a time window) and then it is only used if it is
+# already up to date, so the first read of a window costs the window
+def cached_cols(filename,kk=1,skiprows=1):
+    if not (use_cache):
+        return None
+    if (first_row(kk) > 0):
+        return read_cache(filename)
+    return loadcols(filename,skiprows)
+
+# remove the cache files for filename
+def clear_cache(filename):
+    for name in cache_names(filename):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+# column names from the '#' header line that the C code writes,
+# e.g. "# t x y z vx vy vz omx ... Etot dEdt" for print_extended
+def read_header(filename):
+    with open(filename) as fp:
+        line = fp.readline()
+    if not line.startswith('#'):
+        return []
+    return line.lstrip('#').split()
+
+# read only the named columns of a text output file, using its header
+# returns a dictionary name -> 1d array (every kk-th row, at most max_rows rows)
+# kk can also be a sorted array of row indices
+# names=None gives all columns
+# with the binary cache the arrays are views into the memory-mapped cache
+# (no copies), but the first read of a file parses and stores all of its
+# columns to build the cache; only without the cache (use_cache=False)
+# are just the requested columns parsed
+# works for any header, so both the dEdt and the dEdtnow,dEdtave
+# versions of the _ext.txt files can be read (readresfile in orbsubs_ur.py
+# only knows the 24 column dEdt version, use readres by name for the others)
+def readcols(filename,names=None,kk=1,max_rows=None):
+    header = read_header(filename)
+    if (names is None):
+        names = header
+    ncols = 0
+    with open(filename,'rb') as fp:
+        fp.readline()
+        ncols = len(fp.readline().split())
+    if (len(header) != ncols):
+        raise ValueError("%s: header has %d names but there are %d columns"\
+            %(filename,len(header),ncols))
+    for name in names:
+        if name not in header:
+            raise ValueError("%s: no column %r, columns are %s"%(filename,name,' '.join(header)))
+    jcols = [header.index(name) for name in names]
+    cols = cached_cols(filename,kk)
+    if (cols is not None):
+        if (max_rows is not None):
+            cols = cols[:,:max_rows]
+        cols = select_rows(cols,0,kk)
+        return {name:cols[j] for name,j in zip(names,jcols)}
+    parts = []
+    i0 = first_row(kk)
+    for chunk in iter_chunks(filename,max_rows=max_rows,usecols=jcols,start_row=i0):
+        parts.append(select_rows(chunk,i0,kk).copy())
+        i0 += chunk.shape[1]
+    if (len(parts) == 0):
+        cols = np.zeros((len(names),0))
+    else:
+        cols = np.concatenate(parts,axis=1)
+    return {name:cols[i] for i,name in enumerate(names)}
+
+
+# sha1 hash object fed the first nbytes bytes of a file, as a content
+# fingerprint of the part of a growing file that has already been processed
+# (more bytes can then be added with update(), see read_rows)
+# returns None if the file is shorter than nbytes
+def prefix_hash(filename,nbytes):
+    h = hashlib.sha1()
+    left = nbytes
+    with open(filename,'rb') as fp:
+        while (left > 0):
+            block = fp.read(min(left,1024*1024))
+            if not block:
+                return None
+            h.update(block)
+            left -= len(block)
+    return h
+
+# parse the next nrows lines of a file opened in binary mode
+# returns an (ncols,n) array, like iter_chunks
+# if h (a hash object, see prefix_hash) is given the lines are added to it
+def read_rows(fp,nrows,h=None):
+    lines = list(islice(fp,nrows))
+    if (h is not None):
+        h.update(b''.join(lines))
+    if (len(lines) == 0):
+        return np.zeros((0,0))
+    return np.ascontiguousarray(np.loadtxt(lines,ndmin=2).T)
+
+
+# time index of a text output, the time (first column) of every complete row
+# kept next to the file as filename.tidx (raw float64) with filename.tidx.json
+# holding the number of rows, the byte offset after the last indexed row
+# and a hash of that row
+# if the file has grown only the new rows are read (and only their first
+# column parsed), if it was changed it is indexed again
+# time_rows() then finds the rows in a time window by binary search, and
+# those rows can be read on their own with start_row/max_rows
+def tindex_names(filename):
+    return filename+'.tidx', filename+'.tidx.json'
+
+# the last bytes of a file before offset, the line that ends there
+def tail_line(filename,offset,nbytes):
+    with open(filename,'rb') as fp:
+        fp.seek(offset-nbytes)
+        return fp.read(nbytes)
+
+# bring the time index up to date, returns the times of all rows
+# (memory mapped) and whether they are in increasing order
+def time_index(filename,skiprows=1):
+    binname,metaname = tindex_names(filename)
+    try:
+        with open(metaname) as fp:
+            meta = json.load(fp)
+        line = tail_line(filename,meta['bytes'],meta['tail_len'])
+        if (hashlib.sha1(line).hexdigest() != meta['tail']) or (meta['skiprows'] != skiprows):
+            meta = None
+    except (OSError, ValueError, KeyError):
+        meta = None
+    if (meta is None):
+        with open(filename,'rb') as fp:
+            for i in range(skiprows):
+                fp.readline()
+            offset = fp.tell()
+        meta = {'nrows':0, 'bytes':offset, 'tail':'', 'tail_len':0, 'ncols':0,\
+            'sorted':True, 'tlast':-np.inf, 'skiprows':skiprows}
+        open(binname,'wb').close()
+    if (os.path.getsize(filename) > meta['bytes']):
+        with open(filename,'rb') as fp, open(binname,'r+b') as fb:
+            fp.seek(meta['bytes'])
+            fb.truncate(meta['nrows']*8)
+            fb.seek(meta['nrows']*8)
+            while True:
+                lines = fp.readlines(chunk_bytes)
+                if (len(lines) == 0):
+                    break
+                if (meta['ncols'] == 0):
+                    meta['ncols'] = len(lines[0].split())
+                last = (not lines[-1].endswith(b'\n')) or (len(lines[-1].split()) != meta['ncols'])
+                if (last):
+                    lines.pop()
+                if (len(lines) == 0):
+                    break
+                t = np.loadtxt(lines,usecols=[0],ndmin=1)
+                fb.write(t.tobytes())
+                meta['sorted'] = meta['sorted'] and bool(t[0] >= meta['tlast']) and bool(np.all(np.diff(t) >= 0))
+                meta['tlast'] = float(t[-1])
+                meta['nrows'] += len(t)
+                meta['bytes'] += sum(len(l) for l in lines)
+                meta['tail'] = hashlib.sha1(lines[-1]).hexdigest()
+                meta['tail_len'] = len(lines[-1])
+                if (last):
+                    break
+        try:
+            with open(metaname+'.tmp','w') as fp:
+                json.dump(meta,fp)
+            os.replace(metaname+'.tmp',metaname)
+        except OSError as err:
+            print("could not write time index for %s: %s"%(filename,err))
+    if (meta['nrows'] == 0):
+        return np.zeros(0),True
+    return np.memmap(binname,dtype=float,mode='r',shape=(meta['nrows'],)),meta['sorted']
+
+# rows i0 to i1-1 of a text output are those with tmin <= t <= tmax
+# (None for no limit), found by binary search on the time index
+# if the times are not in order (restarted run) the first and last rows
+# in the window are found by a scan instead
+def time_rows(filename,tmin=None,tmax=None):
+    t,is_sorted = time_index(filename)
+    if (tmin is None): tmin = -np.inf
+    if (tmax is None): tmax = np.inf
+    if (is_sorted):
+        i0 = int(np.searchsorted(t,tmin,side='left'))
+        i1 = int(np.searchsorted(t,tmax,side='right'))
+        return i0,max(i1,i0)
+    j = np.flatnonzero((t >= tmin) & (t <= tmax))
+    if (len(j) == 0):
+        return 0,0
+    return int(j[0]),int(j[-1])+1
+
+
+# row index of a text output, the byte offset of every rowidx_every-th row
+# kept next to the file as filename.ridx (raw int64) with filename.ridx.json
+# it is built by one scan for newlines (nothing is parsed) and extended
+# like the time index when the file grows
+# with it any row can be reached by a seek and at most rowidx_every-1
+# skipped lines, the file can be cut into pieces of whole rows that are
+# parsed independently (read_parallel) and the last rows read without
+# going through the rest of the file (read_tail)
+# works for any text output (_ext.txt, _pm*.txt, ...)
+rowidx_every = 4096
+use_rowidx = True   # iter_chunks() seeks with the row index for start_row > 0
+
+# parse_pool = 'process' makes loadcols() parse a file that is not cached
+# yet in pieces over a pool of processes (iter_parallel), None parses it
+# in this process, chunk by chunk
+parse_pool = None
+
+def rowidx_names(filename):
+    return filename+'.ridx', filename+'.ridx.json'
+
+# bring the row index up to date, returns the offsets (memory mapped) of
+# rows 0, every, 2*every, ... and the number of complete rows
+def row_index(filename,skiprows=1,every=None):
+    if (every is None):
+        every = rowidx_every
+    binname,metaname = rowidx_names(filename)
+    try:
+        with open(metaname) as fp:
+            meta = json.load(fp)
+        line = tail_line(filename,meta['bytes'],meta['tail_len'])
+        if (hashlib.sha1(line).hexdigest() != meta['tail']) or (meta['skiprows'] != skiprows)\
+            or (meta['every'] != every):
+            meta = None
+    except (OSError, ValueError, KeyError):
+        meta = None
+    if (meta is None):
+        # nlines newlines seen, bytes is the offset of the line after the last one
+        meta = {'nlines':0, 'bytes':0, 'noffs':0, 'tail':hashlib.sha1(b'').hexdigest(),\
+            'tail_len':0, 'skiprows':skiprows, 'every':every}
+        open(binname,'wb').close()
+    if (os.path.getsize(filename) > meta['bytes']):
+        with open(filename,'rb') as fp, open(binname,'r+b') as fb:
+            fb.truncate(meta['noffs']*8)
+            fb.seek(meta['noffs']*8)
+            pos = meta['bytes']
+            fp.seek(pos)
+            tail0 = pos - meta['tail_len']  # start of the last complete line
+            while True:
+                block = fp.read(chunk_bytes)
+                if not block:
+                    break
+                nl = pos + np.flatnonzero(np.frombuffer(block,dtype=np.uint8) == 10)
+                pos += len(block)
+                if (len(nl) == 0):
+                    continue
+                # line starts, the first len(nl) of them are completed by nl
+                starts = np.concatenate(([meta['bytes']],nl+1))
+                r = meta['nlines'] + np.arange(len(nl)) - skiprows  # row numbers
+                keep = (r >= 0) & (r % every == 0)
+                fb.write(starts[:-1][keep].astype(np.int64).tobytes())
+                meta['noffs'] += int(np.sum(keep))
+                meta['nlines'] += len(nl)
+                tail0 = int(starts[-2])
+                meta['bytes'] = int(starts[-1])
+            meta['tail_len'] = meta['bytes'] - tail0
+            meta['tail'] = hashlib.sha1(tail_line(filename,meta['bytes'],meta['tail_len'])).hexdigest()
+        try:
+            with open(metaname+'.tmp','w') as fp:
+                json.dump(meta,fp)
+            os.replace(metaname+'.tmp',metaname)
+        except OSError as err:
+            print("could not write row index for %s: %s"%(filename,err))
+    nrows = max(meta['nlines'] - skiprows,0)
+    if (meta['noffs'] == 0):
+        return np.zeros(0,dtype=np.int64),nrows
+    return np.memmap(binname,dtype=np.int64,mode='r',shape=(meta['noffs'],)),nrows
+
+# byte offset of row i (i = nrows gives the end of the last complete row)
+def row_offset(filename,i,skiprows=1):
+    offs,nrows = row_index(filename,skiprows)
+    every = rowidx_every
+    i = min(max(int(i),0),nrows)
+    k = i//every
+    if (k >= len(offs)):  # i == nrows on a multiple of every
+        k = len(offs)-1
+    if (k < 0):  # no rows
+        with open(filename,'rb') as fp:
+            for j in range(skiprows):
+                fp.readline()
+            return fp.tell()
+    with open(filename,'rb') as fp:
+        fp.seek(int(offs[k]))
+        skip_lines(fp,i - k*every)
+        return fp.tell()
+
+# parse the whole rows between byte offsets a and b of a file
+# returns an (ncols,n) array, a malformed last row is dropped
+def parse_range(filename,a,b,usecols=None):
+    with open(filename,'rb') as fp:
+        fp.seek(a)
+        lines = fp.read(b-a).splitlines()
+    if (len(lines) == 0):
+        return np.zeros((0,0))
+    if (len(lines[-1].split()) != len(lines[0].split())):
+        lines.pop()
+    return np.ascontiguousarray(np.loadtxt(lines,ndmin=2,usecols=usecols).T)
+
+def parse_range_args(args):
+    return parse_range(*args)
+
+# rows i0 to i1-1 of a text output, as an (ncols,n) array
+def read_row_range(filename,i0,i1,skiprows=1,usecols=None):
+    a = row_offset(filename,i0,skiprows)
+    b = row_offset(filename,i1,skiprows)
+    if (b <= a):
+        return np.zeros((0,0))
+    return parse_range(filename,a,b,usecols)
+
+# the last n rows of a text output, as an (ncols,n) array
+def read_tail(filename,n,skiprows=1,usecols=None):
+    offs,nrows = row_index(filename,skiprows)
+    return read_row_range(filename,max(nrows-n,0),nrows,skiprows,usecols)
+
+# generator giving the data of a text file (or its first max_rows rows) in
+# pieces of whole rows, parsed over a pool of nworkers processes, in order
+# nworkers=1 parses the pieces one after another in this process
+def iter_parallel(filename,skiprows=1,max_rows=None,usecols=None,nworkers=None):
+    offs,nrows = row_index(filename,skiprows)
+    if (max_rows is not None):
+        nrows = min(nrows,max_rows)
+    if (nrows == 0):
+        return
+    if (nworkers is None):
+        nworkers = os.cpu_count() or 1
+    # about 4 pieces per worker so they finish together, each some blocks of rows
+    nblk = (nrows + rowidx_every - 1)//rowidx_every
+    g = max(nblk//(4*nworkers),1)
+    bounds = [int(o) for o in offs[:nblk:g]] + [row_offset(filename,nrows,skiprows)]
+    args = [(filename,a,b,usecols) for a,b in zip(bounds[:-1],bounds[1:])]
+    if (nworkers == 1) or (len(args) == 1):
+        parts = map(parse_range_args,args)
+        yield from (p for p in parts if p.shape[1] > 0)
+        return
+    with ProcessPoolExecutor(max_workers=nworkers) as ex:
+        for p in ex.map(parse_range_args,args):
+            if (p.shape[1] > 0):
+                yield p
+
+# the whole file (or its first max_rows rows) parsed over a pool of
+# processes, as an (ncols,n) array
+def read_parallel(filename,skiprows=1,max_rows=None,usecols=None,nworkers=None):
+    parts = list(iter_parallel(filename,skiprows,max_rows,usecols,nworkers))
+    if (len(parts) == 0):
+        return np.zeros((0,0))
+    return np.concatenate(parts,axis=1)
+
+# remove the row index files for filename
+def clear_rowidx(filename):
+    for name in rowidx_names(filename):
+        if os.path.exists(name):
+            os.remove(name)
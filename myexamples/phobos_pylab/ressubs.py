@@ -0,0 +1,260 @@
+import numpy as np
+from itertools import combinations, product
+from math import gcd
+
+from angsubs import * # angle wrapping routines
+
+# search for librating resonance arguments
+# every argument sum_k c_k theta_k with integer c_k, |c_k| <= order, is
+# built from a set of base angles theta (mean longitudes, longitudes of
+# pericenter and node of each orbit, the precession angle and phi_Eu)
+# at most nterms of the c_k are nonzero, their gcd is 1 and the first one
+# is positive (so c and -c or 2c are not both tried), with dalembert=True
+# the c_k sum to zero as they do for a physical resonant argument
+# the run is cut into windows and in each window an argument librates if
+# it leaves an arc of at least nb_empty of nb bins on the circle unvisited,
+# otherwise it circulates
+# an argument that turns slowly can look confined in a short window, so
+# the net number of turns over the whole run is also given
+# all arguments are evaluated as one matrix product C @ theta, in blocks
+# of arguments to bound memory
+
+res_block = 2**24  # max number of argument*sample values held at once
+nbins = 24         # bins on the circle (15 degrees each)
+nb_empty = 2       # a gap of this many empty bins means libration
+
+# base angles of a Run (see orbsubs_ur.py), names and an (nang,ns) array
+# index i of lam, varpi, Om is as in orbels_arr (0 is the resolved body)
+def base_angles(run):
+    names = []; angs = []
+    for i in range(run.numberpm):
+        names += ['lam%d'%i, 'varpi%d'%i, 'Om%d'%i]
+        angs += [run.meanlongitude[i], run.varpi[i], run.ln[i]]
+    names += ['prec','phiEu']
+    angs += [run.prec_ang, run.phi_Eu]
+    return names,np.array(angs)
+
+# (ncomb,nang) integer array of the coefficient vectors to try
+def res_combos(nang,order=3,nterms=3,dalembert=True):
+    rows = []
+    vals = [v for v in range(-order,order+1) if v != 0]
+    for nt in range(1,nterms+1):
+        for idx in combinations(range(nang),nt):
+            for cs in product(vals,repeat=nt):
+                if (cs[0] < 0):
+                    continue
+                if (dalembert) and (sum(cs) != 0):
+                    continue
+                g = 0
+                for c in cs:
+                    g = gcd(g,abs(c))
+                if (g != 1):
+                    continue
+                row = np.zeros(nang,dtype=int)
+                row[list(idx)] = cs
+                rows.append(row)
+    return np.array(rows,dtype=int).reshape(-1,nang)
+
+# readable name of an argument, e.g. "2*lam1 - lam0 - varpi0"
+def res_name(c,names):
+    s = ''
+    for ck,name in zip(c,names):
+        if (ck == 0):
+            continue
+        sign = '-' if (ck < 0) else '+'
+        term = name if (abs(ck) == 1) else '%d*%s'%(abs(ck),name)
+        if (s == ''):
+            s = term if (ck > 0) else '-'+term
+        else:
+            s += ' %s %s'%(sign,term)
+    return s
+
+# libration in windows of angles phi (nc,ns), w samples per window
+# returns lib (nc,nwin) bool, amplitude (half the visited arc, radians)
+# and centre (circular mean) for each argument and window
+def window_libration(phi,w,nb=None,nempty=None):
+    if (nb is None): nb = nbins
+    if (nempty is None): nempty = nb_empty
+    nc,ns = phi.shape
+    nwin = ns//w
+    pw = phi[:,:nwin*w].reshape(nc,nwin,w)
+    jb = (wrap_two_pi(pw)*(nb/twopi)).astype(int) % nb
+    flat = (np.arange(nc*nwin)*nb).reshape(nc,nwin,1) + jb
+    occ = np.bincount(flat.ravel(),minlength=nc*nwin*nb).reshape(nc,nwin,nb) > 0
+    # longest run of empty bins, going round the circle (occupancy doubled)
+    occ2 = np.concatenate((occ,occ),axis=2)
+    pos = np.arange(2*nb)
+    last = np.maximum.accumulate(np.where(occ2,pos,-1),axis=2)
+    gap = np.minimum(np.max(pos - last,axis=2),nb)
+    lib = gap >= nempty
+    amp = 0.5*(nb - gap)*(twopi/nb)
+    cen = np.angle(np.mean(np.exp(1j*pw),axis=2))
+    return lib,amp,cen
+
+# scan all arguments of a Run, nwin windows (or w samples per window)
+# angles = (names,array) to use other base angles than base_angles(run)
+# returns a table, a list of dictionaries sorted by the fraction of
+# windows in which the argument librates, then by mean amplitude
+def scan_resonances(run,order=3,nterms=3,nwin=20,w=None,dalembert=True,angles=None):
+    names,A = base_angles(run) if (angles is None) else angles
+    A = np.asarray(A,dtype=float)
+    ns = A.shape[1]
+    if (w is None):
+        w = max(ns//nwin,1)
+    C = res_combos(len(names),order,nterms,dalembert)
+    nblk = max(res_block//ns,1)
+    table = []
+    for i0 in range(0,len(C),nblk):
+        Cb = C[i0:i0+nblk]
+        phi = Cb.astype(float) @ A
+        lib,amp,cen = window_libration(phi,w)
+        frac = np.mean(lib,axis=1)
+        uw = unwrap_ang(phi,axis=1)
+        turns = (uw[:,-1] - uw[:,0])/twopi
+        for k in range(len(Cb)):
+            libk = lib[k]
+            table.append({'name':res_name(Cb[k],names), 'coeffs':Cb[k], 'lib_frac':frac[k],\
+                'amp':np.mean(amp[k][libk]) if np.any(libk) else np.pi,\
+                'centre':np.angle(np.mean(np.exp(1j*cen[k][libk]))) if np.any(libk) else np.nan,\
+                'turns':turns[k], 'lib':libk})
+    table.sort(key=lambda row:(-row['lib_frac'],row['amp']))
+    return table
+
+# print the top nmax rows of a table from scan_resonances
+def print_resonances(table,nmax=20):
+    print("%-40s %8s %8s %8s %8s"%("argument","lib_frac","amp_deg","ctr_deg","turns"))
+    for row in table[:nmax]:
+        print("%-40s %8.2f %8.1f %8.1f %8.1f"%(row['name'],row['lib_frac'],row['amp']*180/np.pi,\
+            row['centre']*180/np.pi,row['turns']))
+
+
+# spin-orbit states
+# every sample is labelled with the nearest half integer p/2 of spin/n
+# (n the mean motion) and its distance from it, it is in the p/2 state if
+# that distance is less than so_tol
+# runs of samples in the same state are merged into intervals, states that
+# last less than a minimum duration are dropped and the gaps shorter than it
+# between intervals in the same state are closed, so a spin hovering at the
+# edge of the tolerance does not give a capture at every crossing
+# the minimum duration is so_minorb orbital periods, or so_mindur (a time)
+# if that is set
+# an interval index is a structured array, sorted by start time, of
+#   p      resonance is p/2 (2 is synchronous)
+#   i0,i1  first and last sample index
+#   t0,t1  start and end time
+#   run    run number (for indices of many runs, see join_intervals)
+so_tol = 0.01
+so_minorb = 3.0
+so_mindur = None
+
+interval_dtype = np.dtype([('p',int),('i0',int),('i1',int),('t0',float),('t1',float),('run',int)])
+
+# label every sample, returns p (p/2 is the nearest half integer of spin/n),
+# dist = spin/n - p/2, and inres = |dist| < tol
+def spin_states(spin,n,tol=None):
+    if (tol is None):
+        tol = so_tol
+    ratio = np.asarray(spin)/np.asarray(n)
+    p = np.round(2.0*ratio).astype(int)
+    dist = ratio - 0.5*p
+    return p,dist,np.abs(dist) < tol
+
+# mean motion of the resolved body of a Run (see orbsubs_ur.py)
+def run_mean_motion(run):
+    return np.sqrt(run.mvec[0]+1)/np.abs(run.aa[0])**1.5
+
+# spin and mean motion of the resolved body of a Run
+def run_spin_states(run,tol=None):
+    return spin_states(run.spin,run_mean_motion(run),tol)
+
+# minimum duration of a state for mean motion n (a number or array)
+def min_duration(n):
+    if (so_mindur is not None):
+        return so_mindur
+    return so_minorb*twopi/np.nanmedian(n)
+
+# merge labelled samples into an interval index (see above)
+# mindur=None is so_mindur, or no minimum if that is not set either (use
+# min_duration() to have it in orbital periods)
+def state_intervals(t,p,inres,mindur=None,run=0):
+    if (mindur is None):
+        mindur = so_mindur if (so_mindur is not None) else 0.0
+    t = np.asarray(t)
+    code = np.where(inres,p,-1)  # -1 for not in any state
+    if (len(code) == 0):
+        return np.zeros(0,dtype=interval_dtype)
+    # runs of equal code
+    starts = np.flatnonzero(np.concatenate(([True],code[1:] != code[:-1])))
+    ends = np.concatenate((starts[1:]-1,[len(code)-1]))
+    keep = code[starts] >= 0
+    i0 = starts[keep]; i1 = ends[keep]; pk = code[starts][keep]
+    if (mindur > 0):
+        # drop short states first, so a short blip into another state
+        # leaves a gap that can be closed
+        long = (t[i1] - t[i0]) >= mindur
+        i0 = i0[long]; i1 = i1[long]; pk = pk[long]
+    if (mindur > 0) and (len(i0) > 0):
+        # close short gaps between the intervals left in the same state
+        join = (pk[1:] == pk[:-1]) & (t[i0[1:]] - t[i1[:-1]] < mindur)
+        first = np.concatenate(([True],~join))
+        i1 = np.maximum.reduceat(i1,np.flatnonzero(first))
+        i0 = i0[first]; pk = pk[first]
+    iv = np.zeros(len(i0),dtype=interval_dtype)
+    iv['p'] = pk; iv['i0'] = i0; iv['i1'] = i1
+    iv['t0'] = t[i0]; iv['t1'] = t[i1]; iv['run'] = run
+    return iv
+
+# interval index of the spin-orbit states of a Run
+# mindur=None is min_duration() of the run's mean motion
+def run_intervals(run,tol=None,mindur=None):
+    n = run_mean_motion(run)
+    p,dist,inres = spin_states(run.spin,n,tol)
+    if (mindur is None):
+        mindur = min_duration(n)
+    return state_intervals(run.t,p,inres,mindur)
+
+# captures (start of a state, not at the start of the run) and escapes
+# (end of a state, not at the end of the run), as sub-arrays of the index
+def captures(iv,tstart=None):
+    if (tstart is None):
+        tstart = np.min(iv['t0']) if len(iv) else 0.0
+    return iv[iv['t0'] > tstart]
+
+def escapes(iv,tend=None):
+    if (tend is None):
+        tend = np.max(iv['t1']) if len(iv) else 0.0
+    return iv[iv['t1'] < tend]
+
+# intervals containing time t
+def intervals_at(iv,t):
+    j = np.searchsorted(iv['t0'],t,side='right')
+    cand = iv[:j]
+    return cand[cand['t1'] >= t]
+
+# intervals overlapping [ta,tb], optionally only those in state p
+def intervals_in(iv,ta,tb,p=None):
+    j = np.searchsorted(iv['t0'],tb,side='right')
+    cand = iv[:j]
+    cand = cand[cand['t1'] >= ta]
+    if (p is not None):
+        cand = cand[cand['p'] == p]
+    return cand
+
+# one index for many runs, run field set to the position in ivs
+def join_intervals(ivs):
+    parts = []
+    for k,iv in enumerate(ivs):
+        iv = np.array(iv,dtype=interval_dtype)
+        iv['run'] = k
+        parts.append(iv)
+    if (len(parts) == 0):
+        return np.zeros(0,dtype=interval_dtype)
+    iv = np.concatenate(parts)
+    return iv[np.argsort(iv['t0'],kind='stable')]
+
+# save or load an interval index, e.g. as fileroot_so.npy
+def save_intervals(filename,iv):
+    np.save(filename,iv)
+
+def load_intervals(filename):
+    return np.load(filename)
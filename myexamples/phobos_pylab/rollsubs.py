@@ -0,0 +1,168 @@
+import numpy as np
+from heapq import heappush, heappop
+from scipy.ndimage import percentile_filter
+
+from readsubs import * # reading simulation outputs
+
+# rolling (running window) statistics of a time series
+# windows are w samples long, centred, with w made odd
+# stat is one of
+#   'mean'      mean, O(n) from a cumulative sum
+#   'logmean'   mean of log10(y+logfloor), i.e. log10 of the geometric mean,
+#               what you want for dE/dt that spans decades
+#   'median'    median, O(n log w) (the 1d rank filter of scipy.ndimage)
+#   'quantile'  quantile q (0 to 1), O(n log w)
+# the first and last w//2 outputs do not have a full window, edge sets
+# what they are
+#   'shrink'    statistic of the part of the window inside the series,
+#               O(w log w) for the w//2 outputs at each end
+#   'nan'       nan
+#   'nearest'   series extended with its end values
+#   'reflect'   series reflected about its ends
+# rolling_column() does the same on a column of a text output at full
+# resolution, reading it in chunks, and only keeps the rows asked for
+# so a decimated plot can show a smoothed trend without aliasing
+
+rstats = ('mean','logmean','median','quantile')
+edges = ('shrink','nan','nearest','reflect')
+
+logfloor = 1e-10   # added before taking log10 for 'logmean'
+
+# statistic of every full window of y (n-w+1 values, w odd)
+def rolling_valid(y,w,stat='median',q=0.5):
+    y = np.asarray(y,dtype=float)
+    n = len(y)
+    if (n < w):
+        return np.zeros(0)
+    if (stat == 'logmean'):
+        y = np.log10(y + logfloor)
+        stat = 'mean'
+    if (stat == 'mean'):
+        cs = np.concatenate(([0.0],np.cumsum(y)))
+        return (cs[w:] - cs[:-w])/w
+    if (stat == 'median'):
+        q = 0.5
+    elif (stat != 'quantile'):
+        raise ValueError("unknown statistic %r, should be one of %s"%(stat,rstats))
+    h = w//2
+    return percentile_filter(y,100.0*q,size=w,mode='nearest')[h:n-h]
+
+# statistic of the h shrunk windows at the start of y, y[:h+1], y[:h+2],
+# ... y[:2h] (the part of each window inside the series)
+# means come from a cumulative sum, median and quantiles from two heaps
+# that the values are added to one by one, O(h log h) in all
+def rolling_prefix(y,h,stat,q):
+    y = np.asarray(y[:2*h],dtype=float)
+    lens = np.arange(h+1,2*h+1)
+    if (stat == 'logmean'):
+        y = np.log10(y + logfloor)
+        stat = 'mean'
+    if (stat == 'mean'):
+        return np.cumsum(y)[lens-1]/lens
+    if (stat not in rstats):
+        raise ValueError("unknown statistic %r, should be one of %s"%(stat,rstats))
+    lo = []  # max heap (values negated) of the smallest values
+    hi = []  # min heap of the others
+    out = np.empty(h)
+    for k,v in enumerate(y.tolist()):
+        if (len(lo) > 0) and (v <= -lo[0]):
+            heappush(lo,-v)
+        else:
+            heappush(hi,v)
+        n = k+1
+        if (n <= h):
+            continue
+        # lo holds the nlo smallest values, its top is the one wanted (the
+        # lower middle one for the median), hi the rest
+        nlo = (n+1)//2 if (stat == 'median') else min(int(q*n),n-1)+1
+        while (len(lo) > nlo):
+            heappush(hi,-heappop(lo))
+        while (len(lo) < nlo):
+            heappush(lo,-heappop(hi))
+        if (stat == 'median') and (n % 2 == 0):
+            out[n-h-1] = 0.5*(hi[0] - lo[0])
+        else:
+            out[n-h-1] = -lo[0]
+    return out
+
+# outputs for the first (head=True) or last w//2 samples of y
+# y only needs to hold the first (or last) w-1 or more samples of the series
+def rolling_edge(y,w,stat,q,edge,head):
+    h = w//2
+    y = np.asarray(y,dtype=float)
+    n = len(y)
+    if (h == 0):
+        return np.zeros(0)
+    if (edge == 'nan'):
+        return np.full(h,np.nan)
+    if (edge == 'shrink'):
+        if (head):
+            return rolling_prefix(y,h,stat,q)
+        return rolling_prefix(y[::-1],h,stat,q)[::-1]
+    if (edge == 'nearest'):
+        pad = np.full(h,y[0] if head else y[-1])
+    elif (edge == 'reflect'):
+        pad = y[h-1::-1] if head else y[:n-h-1:-1]
+    else:
+        raise ValueError("unknown edge mode %r, should be one of %s"%(edge,edges))
+    if (head):
+        return rolling_valid(np.concatenate((pad,y[:w-1])),w,stat,q)
+    return rolling_valid(np.concatenate((y[n-w+1:],pad)),w,stat,q)
+
+# rolling statistic of y, same length as y
+def rolling_stat(y,w,stat='median',q=0.5,edge='shrink'):
+    y = np.asarray(y,dtype=float)
+    n = len(y)
+    w = int(w) | 1
+    if (n == 0):
+        return np.zeros(0)
+    if (n < w):  # no full windows, w is cut down to the series
+        w = (n-1) | 1
+        if (w == 1):
+            return rolling_valid(y,1,stat,q)
+    h = w//2
+    out = np.empty(n)
+    out[:h] = rolling_edge(y[:2*h],w,stat,q,edge,True)
+    out[h:n-h] = rolling_valid(y,w,stat,q)
+    out[n-h:] = rolling_edge(y[n-2*h:],w,stat,q,edge,False)
+    return out
+
+# rolling statistic of a column of a text output file (col is a column
+# index or a name from the header), computed at every row but only
+# returned at every kk-th row (or rows in the sorted index array kk)
+# the file is read in chunks with an overlap of w-1 rows between them
+# rows before start_row are skipped (and the series taken to start there)
+# with use_cache the column is taken from the binary cache instead of
+# parsing the file again, the cache is built if needed only when reading
+# from the first row (as cached_cols in readsubs.py), past it an existing
+# up to date cache is used and otherwise just the rows wanted are parsed
+def rolling_column(filename,col,w,stat='median',q=0.5,edge='shrink',kk=1,max_rows=None,start_row=0):
+    if isinstance(col,str):
+        header = read_header(filename)
+        if col not in header:
+            raise ValueError("%s: no column %r, columns are %s"%(filename,col,' '.join(header)))
+        col = header.index(col)
+    if (use_cache) and (start_row == 0):
+        loadcols(filename)  # so iter_cols finds an up to date cache
+    w = int(w) | 1
+    h = w//2
+    parts = []
+    buf = np.zeros(0)   # last w-1 rows of the data read so far (or all if fewer)
+    ncen = start_row    # index of the next row to give an output for
+    nread = 0
+    for chunk in iter_cols(filename,max_rows=max_rows,usecols=[col],start_row=start_row):
+        buf = np.concatenate((buf,chunk[0]))
+        nread += chunk.shape[1]
+        if (nread < w):
+            continue
+        out = rolling_valid(buf,w,stat,q)
+        if (ncen == start_row):
+            out = np.concatenate((rolling_edge(buf,w,stat,q,edge,True),out))
+        parts.append(select_rows(out[None,:],ncen,kk)[0].copy())
+        ncen += len(out)
+        buf = buf[len(buf)-(w-1):]
+    if (nread < w):   # short file, all in memory
+        return select_rows(rolling_stat(buf,w,stat,q,edge)[None,:],start_row,kk)[0]
+    out = rolling_edge(buf,w,stat,q,edge,False)
+    parts.append(select_rows(out[None,:],ncen,kk)[0].copy())
+    return np.concatenate(parts)
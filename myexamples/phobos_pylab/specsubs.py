@@ -0,0 +1,144 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from readsubs import * # reading simulation outputs
+
+# spectra of time series over sliding windows (spectrograms) and the
+# dominant frequency in each window
+# all windows are done at once, the (nwin,nw) stack of windows is a strided
+# view of the series and is transformed in one fft call
+# frequencies are angular (radians per unit time) so they can be compared
+# directly with spin and mean motion
+# angle=True is for angles (prec_ang, phi_Eu - lambda, ...): the spectrum of
+# exp(i angle) is taken, its peak is at the signed rate of the angle and no
+# unwrapping is needed
+# evenly spaced times use the fft, unevenly spaced ones (minmax or lttb
+# decimation) a Lomb-Scargle periodogram on the same frequency grid
+
+twopi = 2.0*np.pi
+
+ls_block = 2**22   # max number of window*frequency*sample terms per Lomb-Scargle step
+
+# (nwin,nw) strided view of the windows of y, nw long, every step samples
+def windows(y,nw,step):
+    return sliding_window_view(np.asarray(y),nw,axis=-1)[::step]
+
+# times at the middle of each window
+def window_times(t,nw,step):
+    tw = windows(t,nw,step)
+    return 0.5*(tw[:,0] + tw[:,-1])
+
+# true if the times t are evenly spaced (to relative tolerance rtol of a step)
+def is_uniform(t,rtol=1e-6):
+    dt = np.diff(t)
+    return (len(dt) > 0) and (np.ptp(dt) <= rtol*np.abs(np.mean(dt)))
+
+# frequency grid of an fft of nw samples spaced by dt, times pad for zero padding
+# signed (fftshift order) for angles, non-negative otherwise
+def fft_freqs(nw,dt,pad=1,angle=False):
+    if (angle):
+        return twopi*np.fft.fftshift(np.fft.fftfreq(nw*pad,dt))
+    return twopi*np.fft.rfftfreq(nw*pad,dt)
+
+# windows ready to transform: exp(i angle) for angles, mean removed otherwise,
+# multiplied by a hann taper
+def prep_windows(yw,angle,taper):
+    if (angle):
+        yw = np.exp(1j*yw)
+    else:
+        yw = yw - np.mean(yw,axis=1,keepdims=True)
+    if (taper):
+        yw = yw*np.hanning(yw.shape[1])
+    return yw
+
+# short time fourier transform power, y evenly sampled with spacing dt
+# returns freqs (nf,) and power (nwin,nf)
+def stft(y,dt,nw,step=None,pad=1,angle=False,taper=True):
+    if (step is None):
+        step = max(nw//2,1)
+    yw = prep_windows(windows(y,nw,step),angle,taper)
+    if (angle):
+        F = np.fft.fftshift(np.fft.fft(yw,n=nw*pad,axis=1),axes=1)
+    else:
+        F = np.fft.rfft(yw,n=nw*pad,axis=1)
+    power = np.abs(F)**2/nw
+    return fft_freqs(nw,dt,pad,angle),power
+
+# periodogram of each window (rows of tw,yw) at angular frequencies freqs
+# classic Lomb-Scargle for real series, for angles (complex exp(i angle))
+# the power of the non-uniform discrete fourier transform
+# done in blocks of windows so no more than ls_block terms are held at once
+def lomb_scargle(tw,yw,freqs,angle=False):
+    tw = np.atleast_2d(tw); yw = np.atleast_2d(yw)
+    nwin,nw = yw.shape
+    nf = len(freqs)
+    power = np.zeros((nwin,nf))
+    nb = max(ls_block//(nf*nw),1)
+    w = np.asarray(freqs)[None,:,None]
+    for i0 in range(0,nwin,nb):
+        tb = tw[i0:i0+nb,None,:] - tw[i0:i0+nb,None,:1]  # times from window start
+        yb = yw[i0:i0+nb,None,:]
+        if (angle):
+            F = np.sum(yb*np.exp(-1j*w*tb),axis=2)
+            power[i0:i0+nb] = np.abs(F)**2/nw
+            continue
+        s2 = np.sum(np.sin(2*w*tb),axis=2); c2 = np.sum(np.cos(2*w*tb),axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tau = np.where(freqs[None,:] != 0.0, np.arctan2(s2,c2)/(2*freqs[None,:]), 0.0)
+        arg = w*(tb - tau[:,:,None])
+        c = np.cos(arg); s = np.sin(arg)
+        cc = np.sum(c*c,axis=2); ss = np.sum(s*s,axis=2)
+        yc = np.sum(yb*c,axis=2); ys = np.sum(yb*s,axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pw = 0.5*(yc**2/cc + np.where(ss > 0, ys**2/ss, 0.0))
+        power[i0:i0+nb] = pw
+    return power
+
+# frequency of the highest peak of each row of power, refined by a parabola
+# through the log power of the peak bin and its neighbours
+# frequencies with |f| < fmin are ignored (fmin=None skips the zero bin for
+# real series), freqs must be evenly spaced
+def peak_freqs(freqs,power,fmin=None):
+    P = np.array(power,dtype=float)
+    if (fmin is not None):
+        P[:,np.abs(freqs) < fmin] = 0.0
+    nf = P.shape[1]
+    rows = np.arange(P.shape[0])
+    j = np.clip(np.argmax(P,axis=1),1,nf-2)
+    a,b,c = [np.log(P[rows,j+k] + 1e-300) for k in (-1,0,1)]
+    den = a - 2.0*b + c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d = np.where(den < 0, 0.5*(a-c)/den, 0.0)
+    return freqs[j] + np.clip(d,-0.5,0.5)*(freqs[1]-freqs[0])
+
+# spectrogram and dominant frequency of y(t) over sliding windows of nw
+# samples, every step samples (default nw//2)
+# returns tmid (nwin,) window centre times, freqs (nf,), power (nwin,nf) and
+# fpeak (nwin,) the dominant angular frequency in each window
+def sliding_spectrum(t,y,nw=256,step=None,pad=1,angle=False,taper=True):
+    t = np.asarray(t,dtype=float); y = np.asarray(y,dtype=float)
+    if (step is None):
+        step = max(nw//2,1)
+    nw = min(nw,len(t))
+    tmid = window_times(t,nw,step)
+    dt = (t[-1]-t[0])/(len(t)-1)
+    if is_uniform(t):
+        freqs,power = stft(y,dt,nw,step,pad,angle,taper)
+    else:
+        freqs = fft_freqs(nw,dt,pad,angle)
+        yw = prep_windows(windows(y,nw,step),angle,taper)
+        power = lomb_scargle(windows(t,nw,step),yw,freqs,angle)
+    fmin = None if angle else 0.5*(freqs[1]-freqs[0])
+    return tmid,freqs,power,peak_freqs(freqs,power,fmin)
+
+# sliding spectra of the quantities of a Run (see orbsubs_ur.py) that tell
+# about the spin state: spin, the precession angle, phi_Eu - lambda (the
+# body long axis w.r.t. the mean longitude, librates in spin-orbit resonance)
+# and the components of omega
+# returns a dictionary name -> (tmid,freqs,power,fpeak)
+def run_spectra(run,nw=256,step=None,pad=1):
+    om = readcols(run.fileroot+'_ext.txt',['omx','omy','omz'],kk=run.rows)
+    series = {'spin':(run.spin,False), 'prec_ang':(run.prec_ang,True),\
+        'phi_lam':(run.phi_Eu - run.meanlongitude[0],True),\
+        'omx':(om['omx'],False), 'omy':(om['omy'],False), 'omz':(om['omz'],False)}
+    return {name:sliding_spectrum(run.t,y,nw,step,pad,angle) for name,(y,angle) in series.items()}
@@ -13,6 +13,7 @@ from scipy.signal import medfilt
 
 from kepcart import *
 from outils import * # useful short routines
+from pltsubs import * # drawing, with a fast mode for long runs
 
 angfac = 180.0/np.pi # for converting radians to degrees
 twopi = np.pi*2.0
@@ -315,7 +316,13 @@ def plt_cols(fileroot,numberpm,saveit,tmin,tmax):
 
 
 
-def plt_cols_M(fileroot,numberpm,saveit,Rmars,omega_res,tmin,tmax):
+## fast=True draws with the fast routines of pltsubs.py on an Agg canvas
+## (default plt_fast), figure time then does not grow with the run length,
+## the figure is then returned (it is not known to pyplot)
+plt_fast = False
+def plt_cols_M(fileroot,numberpm,saveit,Rmars,omega_res,tmin,tmax,fast=None):
+    if (fast is None):
+        fast = plt_fast
     tt,mvec,aaarr,eearr,iiarr,lnarr,ararr,maarr,obliq_deg,spin,Jvec,prec_ang,phi_Eu,theta_Eu,bphi_Eu,dEdtnow,dEdtave,Ivec=\
        orbels_arr(fileroot,numberpm)
     varpi = lnarr + ararr   # longitude of pericenter
@@ -325,9 +332,9 @@ def plt_cols_M(fileroot,numberpm,saveit,Rmars,omega_res,tmin,tmax):
     ###########set up figure
     #plt.rcParams.update({'font.size': 14})
     nvpanels=7
-    f,axarr =  plt.subplots(nvpanels,1, dpi=100, figsize=(7,8), sharex=True)
-    plt.autoscale(enable=True, axis='x', tight=True)
-    plt.subplots_adjust(left=0.17, right=0.98, top=0.99, bottom=0.09, \
+    f,axarr =  fig_panels(nvpanels,1,fast, dpi=100, figsize=(7,8), sharex=True)
+    axarr[-1].autoscale(enable=True, axis='x', tight=True)
+    f.subplots_adjust(left=0.17, right=0.98, top=0.99, bottom=0.09, \
         wspace=0.22, hspace=0.0)
     xmin = 0.0; xmax = np.max(tt)  # display range in time
     iimin = 0
@@ -350,19 +357,19 @@ def plt_cols_M(fileroot,numberpm,saveit,Rmars,omega_res,tmin,tmax):
     ares = aaarr[0]
     nres = sGM/abs(ares)**1.5
     nres_min = np.min(nres)
-    kmax = np.int(2*spinmax/nres_min)
-    for i in range(0,kmax+2):  # plot spin orbit resonance locations in pink
-       axarr[il].plot(tt,nres*i/2,'.', color="pink",ms=2)
-    axarr[il].plot(tt,nres,'.', color="orchid",ms=2)  # spin sych tidally locked state
+    kmax = int(2*spinmax/nres_min)
+    # plot spin orbit resonance locations in pink
+    pguides(axarr[il],tt,nres,np.arange(0,kmax+2)/2,"pink",2,fast)
+    pguides(axarr[il],tt,nres,[1.0],"orchid",2,fast)  # spin sych tidally locked state
     if (omega_res >0):
        axarr[il].plot([min(tt),max(tt)],[omega_res,omega_res],':',color='brown',ms=1)
-    axarr[il].plot(tt,spin,'.', color='green',ms=2) # label='')
+    pdots(axarr[il],tt,spin,'green',2,fast) # label='')
 
     axarr[il].set_xlim([xmin,xmax])
 
     il = 1;   # second
     axarr[il].set_ylabel('obliquity\n (deg)')
-    axarr[il].plot(tt,obliq_deg,'c.', ms=2) # label='')
+    pdots(axarr[il],tt,obliq_deg,'c',2,fast) # label='')
 
     il = 2;   # third
     #axarr[il].set_ylabel(r'$a(1\pm e)$')
@@ -375,7 +382,7 @@ def plt_cols_M(fileroot,numberpm,saveit,Rmars,omega_res,tmin,tmax):
         if (max(aaarr[ip])<20*Rmars):
            #axarr[il].errorbar(tt,aaarr[ip],yerr=[ybot,ytop],\
            #  linestyle="None", marker="None", color=colorl)
-           axarr[il].scatter(tt,aaarr[ip]/Rmars,color=colorl, s=1) # label='') # aa
+           pscatter(axarr[il],tt,aaarr[ip]/Rmars,colorl,1,fast) # label='') # aa
 
     il = 3;   # left fourth
     esmo = medfilt(dEdtnow,101)  # smooth dEdt
@@ -384,31 +391,31 @@ def plt_cols_M(fileroot,numberpm,saveit,Rmars,omega_res,tmin,tmax):
         i0=200
         i1=len(dEdtnow) - 101
     # note cutoff at 1e-15 here!
-    axarr[il].plot(tt[i0:i1],np.log10(esmo[i0:i1]+1e-15),',', color='gray',ms=1);
+    pdots(axarr[il],tt[i0:i1],np.log10(esmo[i0:i1]+1e-15),'gray',1,fast,',');
     axarr[il].set_ylabel(r'$\log_{10}$ dE/dt')
     #ax_r = axarr[il].twinx()
     #try1 = np.log10(esmo+1e-10) +  7.5*np.log10(abs(aaarr[0]))
     #ax_r.plot(tt[i0:i1],try1[i0:i1],',', color='violet',ms=1);
-    axarr[il].plot(tt[1:],np.log10(dEdtave[1:]+1e-15),'.', color='orange',ms=2);
+    pdots(axarr[il],tt[1:],np.log10(dEdtave[1:]+1e-15),'orange',2,fast);
 
     il += 1;  # fifth
     axarr[il].set_ylabel('J (deg)')
     Jvec_deg = Jvec%np.pi *180./np.pi;
-    axarr[il].plot(tt,Jvec_deg,'.', color='cornflowerblue',ms=2) 
+    pdots(axarr[il],tt,Jvec_deg,'cornflowerblue',2,fast) 
     axarr[il].set_ylim([0.0,max(Jvec_deg)])
 
     il += 1;   # sixth
     axarr[il].set_ylabel('inclination\n (deg)')
     for ip in range(numberpm):
         colorl = colorstr[ip%ncolors]
-        axarr[il].scatter(tt,iiarr[ip]*180.0/np.pi,color=colorl, s=1) # label='')
+        pscatter(axarr[il],tt,iiarr[ip]*180.0/np.pi,colorl,1,fast) # label='')
 
     il += 1;   # sixth 
 
     axarr[il].set_ylabel('eccentricity')
     for ip in range(numberpm):
         colorl = colorstr[ip%ncolors]
-        axarr[il].scatter(tt,eearr[ip],color=colorl, s=1) # label='')
+        pscatter(axarr[il],tt,eearr[ip],colorl,1,fast) # label='')
         emax =max(eearr[ip]);
         de = 0.1;
         if (emax < 0.05):
@@ -418,11 +425,13 @@ def plt_cols_M(fileroot,numberpm,saveit,Rmars,omega_res,tmin,tmax):
         axarr[il].yaxis.set_ticks(np.arange(0, emax+de, de))
         axarr[il].set_ylim((-de,emax+de))
 
-    plt.ticklabel_format(axis='x', style='sci', scilimits=(-2,2))
+    axarr[-1].ticklabel_format(axis='x', style='sci', scilimits=(-2,2))
     il = nvpanels-1;  axarr[il].set_xlabel('time')
     # save a png image
     if (len(saveit)>4):
-        plt.savefig(saveit); 
+        savepng(f,saveit)
+    if (fast):
+        return f
 
 
 
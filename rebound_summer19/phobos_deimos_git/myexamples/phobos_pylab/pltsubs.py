@@ -0,0 +1,107 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgb
+
+# drawing routines for plt_cols_M with a fast mode for long series
+# (same as pltsubs.py of myexamples/phobos_pylab)
+# with fast=False they draw exactly what plt_cols_M always drew
+# with fast=True
+#   series with more than dense_n points are binned onto a pixel grid
+#   and shown as one density image (time to draw does not grow with length)
+#   shorter series are drawn as one rasterized Line2D of markers
+#   (never scatter, which makes a path per point)
+#   error bars become a filled band
+#   families of guide curves (resonance lines) are thinned to nguide
+#   points each and drawn as a single LineCollection
+# a fast figure is made directly on an Agg canvas, no gui or pyplot
+# state is involved, and it can be written to png with savepng()
+
+dense_n = 200000   # above this many points a series is binned (fast mode)
+nguide = 512       # points per guide curve (fast mode)
+
+# figure with nrows x ncols panels, like plt.subplots
+def fig_panels(nrows,ncols,fast=False,**kw):
+    if not fast:
+        return plt.subplots(nrows,ncols,**kw)
+    sharex = kw.pop('sharex',False)
+    f = Figure(dpi=kw.pop('dpi',100),figsize=kw.pop('figsize',None))
+    FigureCanvasAgg(f)
+    axarr = f.subplots(nrows,ncols,sharex=sharex,squeeze=kw.pop('squeeze',True))
+    return f,axarr
+
+# pixel column (0..nx-1) of each of the times t, spread over [t0,t1]
+def pixel_cols(t,t0,t1,nx):
+    if (t1 == t0): t1 = t0 + 1.0
+    return np.minimum(((t-t0)*(nx/(t1-t0))).astype(int),nx-1)
+
+# binned density image of y(t), in color, transparency going as log of counts
+def density(ax,t,y,color):
+    good = np.isfinite(t) & np.isfinite(y)
+    t = t[good]; y = y[good]
+    if (len(t) == 0):
+        return
+    bb = ax.get_window_extent()
+    nx = max(int(bb.width),16); ny = max(int(bb.height),16)
+    t0,t1 = np.min(t),np.max(t); y0,y1 = np.min(y),np.max(y)
+    if (t1 == t0): t1 = t0 + 1.0
+    if (y1 == y0): y1 = y0 + 1.0
+    jx = pixel_cols(t,t0,t1,nx); jy = pixel_cols(y,y0,y1,ny)
+    H = np.bincount(jy*nx + jx,minlength=nx*ny).reshape(ny,nx)
+    img = np.zeros((ny,nx,4))
+    img[...,:3] = to_rgb(color)
+    lh = np.log1p(H)
+    img[...,3] = np.where(H>0, 0.3 + 0.7*lh/np.max(lh), 0.0)
+    ax.imshow(img,extent=(t0,t1,y0,y1),origin='lower',aspect='auto',\
+        interpolation='nearest',rasterized=True)
+
+# points y(t) as drawn by ax.plot(t,y,marker,color=color,ms=ms)
+def pdots(ax,t,y,color,ms=1,fast=False,marker='.'):
+    if not fast:
+        return ax.plot(t,y,marker,color=color,ms=ms)
+    if (len(t) > dense_n):
+        return density(ax,t,y,color)
+    return ax.plot(t,y,marker,color=color,ms=ms,rasterized=True)
+
+# points y(t) as drawn by ax.scatter(t,y,color=color,s=s)
+def pscatter(ax,t,y,color,s=1,fast=False):
+    if not fast:
+        return ax.scatter(t,y,color=color,s=s)
+    return pdots(ax,t,y,color,np.sqrt(s),fast,'o')
+
+# y(t) with error bars from y-ylo to y+yhi, as ax.errorbar
+def perrorbar(ax,t,y,ylo,yhi,color,fast=False):
+    if not fast:
+        return ax.errorbar(t,y,yerr=[ylo,yhi],linestyle="None", marker="None", color=color)
+    # envelope of the bars in each of ncols time bins
+    ncols = 2*nguide
+    lo = y - ylo; hi = y + yhi
+    if (len(t) > ncols):
+        idx = np.flatnonzero(np.diff(pixel_cols(t,np.min(t),np.max(t),ncols),prepend=-1))
+        lo = np.minimum.reduceat(lo,idx); hi = np.maximum.reduceat(hi,idx); t = t[idx]
+    return ax.fill_between(t,lo,hi,color=color,alpha=0.3,lw=0,rasterized=True)
+
+# curves fac*base(t) for each fac in facs, like resonance lines nres*i/2
+def pguides(ax,t,base,facs,color,ms=1,fast=False):
+    if not fast:
+        for fac in facs:
+            ax.plot(t,base*fac,'.',color=color,ms=ms)
+        return
+    j = guide_rows(len(t),nguide)
+    tj = t[j]; bj = base[j]
+    segs = [np.column_stack((tj,bj*fac)) for fac in facs]
+    ax.add_collection(LineCollection(segs,colors=color,linewidths=ms))
+
+# about nmax rows spread evenly over n, always keeping the last one
+def guide_rows(n,nmax):
+    if (n <= nmax):
+        return np.arange(n)
+    return np.unique(np.linspace(0,n-1,nmax).astype(int))
+
+# write a figure to a png file through the Agg canvas
+def savepng(f,filename,dpi=None):
+    if (dpi is None):
+        dpi = f.dpi
+    f.savefig(filename,format='png',dpi=dpi)